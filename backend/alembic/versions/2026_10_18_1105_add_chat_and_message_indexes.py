@@ -0,0 +1,34 @@
+"""add composite indexes for chat and message reads
+
+Revision ID: 4d83e0a6b915
+Revises: 9b1f4c2d7e60
+Create Date: 2026-10-18 11:05:12.804131
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4d83e0a6b915'
+down_revision: Union[str, None] = '9b1f4c2d7e60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # users.email уже покрыт уникальным индексом из UniqueConstraint
+    op.create_index('ix_chats_owner_id_id', 'chats', ['owner_id', 'id'], unique=False)
+    op.create_index('ix_messages_chat_id_id', 'messages', ['chat_id', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    # MySQL удаляет автоматический индекс внешнего ключа, когда появляется
+    # составной индекс с тем же первым столбцом, поэтому перед удалением
+    # составных возвращаем одноколоночные — иначе DROP INDEX упадет на FK
+    op.create_index('ix_messages_chat_id', 'messages', ['chat_id'], unique=False)
+    op.drop_index('ix_messages_chat_id_id', table_name='messages')
+    op.create_index('ix_chats_owner_id', 'chats', ['owner_id'], unique=False)
+    op.drop_index('ix_chats_owner_id_id', table_name='chats')
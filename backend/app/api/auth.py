@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, Request, Response, status
 from fastapi.security import OAuth2PasswordRequestForm
 
+from app.api.routing import TimedRoute
 from app.services.user_service import UserService
 from app.schemas.user import UserCreate, UserOut
 from app.schemas.token import TokenResponse
@@ -9,7 +10,7 @@ from app.core.exceptions.schemas import ErrorResponseModel
 from app.utils.unit_of_work import IUnitOfWork, UnitOfWork
 
 
-router = APIRouter(prefix="/api/auth", tags=["Auth"])
+router = APIRouter(prefix="/api/auth", tags=["Auth"], route_class=TimedRoute)
 
 
 async def get_user_service(uow: IUnitOfWork = Depends(UnitOfWork)) -> UserService:
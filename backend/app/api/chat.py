@@ -1,29 +1,82 @@
 from typing import Annotated
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Response, status
+from fastapi.responses import JSONResponse, StreamingResponse
+from app.api.routing import TimedRoute
+from app.core.config.settings import settings
 from app.core.security.auth import get_current_user
 from app.services.chat_service import ChatService
+from app.services.generation_jobs import GenerationJob, generation_jobs
+from app.services.summary_service import SummaryService
+from app.utils.deadline import Deadline
 from app.utils.unit_of_work import IUnitOfWork, UnitOfWork
 from app.schemas.chat import (
     ChatOut,
+    JobOut,
     MessageSchema,
     MessageOut
 )
 from app.schemas.user import UserOut
 
 
-router = APIRouter(prefix="/api/chats", tags=["Chats"])
+router = APIRouter(prefix="/api/chats", tags=["Chats"], route_class=TimedRoute)
 
 
 async def get_chat_service(uow: IUnitOfWork = Depends(UnitOfWork)) -> ChatService:
     return ChatService(uow)
 
 
-@router.get("/", response_model=list[ChatOut])
+async def get_summary_service(
+    # Свой UoW, а не закешированный на запрос: сводка обновляется фоновой
+    # задачей, которая может начаться, пока ChatService еще сохраняет ответ
+    # (например, после отключения клиента от стрима)
+    uow: IUnitOfWork = Depends(UnitOfWork, use_cache=False)
+) -> SummaryService:
+    return SummaryService(uow)
+
+
+def request_deadline() -> Deadline:
+    # Зависимость объявляется до авторизации: время на нее и на БД тоже
+    # входит в дедлайн ответа
+    return Deadline.after(settings.LLM_REQUEST_DEADLINE)
+
+
+# Курсор следующей страницы отдается в заголовке, тело ответа остается списком
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+BACKGROUND_DESCRIPTION = (
+    'With `background=true` the user message is saved and the reply is generated '
+    'in the background: the response is 202 with a job whose status and result '
+    'are polled at the `Location` URL.'
+)
+
+
+def job_accepted(job: GenerationJob) -> JSONResponse:
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content=JobOut.model_validate(job).model_dump(mode="json"),
+        headers={"Location": router.url_path_for("get_generation_job", job_id=job.id)},
+    )
+
+
+@router.get(
+    "/",
+    response_model=list[ChatOut],
+    description=f'Chats newest first. Pass the {NEXT_CURSOR_HEADER} header value '
+                'as `before` (or as `after` when paging forward) to get the next page.',
+)
 async def get_user_chats(
+    response: Response,
     current_user: Annotated[UserOut, Depends(get_current_user)],
-    chat_service: ChatService = Depends(get_chat_service)
+    chat_service: ChatService = Depends(get_chat_service),
+    limit: int = Query(100, ge=1, le=500),
+    before: int | None = None,
+    after: int | None = None
 ):
-    return await chat_service.get_chats_by_user(current_user.id)
+    chats, next_cursor = await chat_service.get_chats_by_user(
+        current_user.id, limit=limit, before=before, after=after)
+    if next_cursor is not None:
+        response.headers[NEXT_CURSOR_HEADER] = str(next_cursor)
+    return chats
 
 
 @router.delete("/{chat_id}")
@@ -35,32 +88,106 @@ async def delete_chat(
     return await chat_service.delete_chat(chat_id, current_user)
 
 
-@router.post("/messages", response_model=MessageOut)
+@router.post(
+    "/messages",
+    response_model=MessageOut,
+    responses={202: {"model": JobOut}},
+    description=BACKGROUND_DESCRIPTION,
+)
 async def send_first_message(
     message_data: MessageSchema,
+    deadline: Annotated[Deadline, Depends(request_deadline)],
     current_user: Annotated[UserOut, Depends(get_current_user)],
-    chat_service: ChatService = Depends(get_chat_service)
+    chat_service: ChatService = Depends(get_chat_service),
+    use_cache: bool = True,
+    background: bool = False
 ):
+    if background:
+        return job_accepted(await chat_service.accept_first_message(
+            message_data, current_user, use_cache=use_cache))
     return await chat_service.create_chat_and_send_message(
-        message_data, current_user)
+        message_data, current_user, use_cache=use_cache, deadline=deadline)
+
+
+@router.get("/jobs/{job_id}", response_model=JobOut)
+async def get_generation_job(
+    job_id: str,
+    current_user: Annotated[UserOut, Depends(get_current_user)]
+):
+    job = generation_jobs.get(job_id)
+    if job is None or job.owner_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+    return job
 
 
-@router.post("/{chat_id}/messages", response_model=MessageOut)
+@router.post(
+    "/{chat_id}/messages",
+    response_model=MessageOut,
+    responses={202: {"model": JobOut}},
+    description=BACKGROUND_DESCRIPTION,
+)
 async def send_message_to_existing_chat(
     chat_id: int,
     message_data: MessageSchema,
+    deadline: Annotated[Deadline, Depends(request_deadline)],
     current_user: Annotated[UserOut, Depends(get_current_user)],
-    chat_service: ChatService = Depends(get_chat_service)
+    background_tasks: BackgroundTasks,
+    chat_service: ChatService = Depends(get_chat_service),
+    summary_service: SummaryService = Depends(get_summary_service),
+    use_cache: bool = True,
+    background: bool = False
+):
+    if background:
+        job = await chat_service.accept_message_to_chat(
+            chat_id, message_data, current_user, use_cache=use_cache)
+        background_tasks.add_task(summary_service.refresh_if_needed, chat_id)
+        return job_accepted(job)
+    message = await chat_service.send_message_to_chat(
+        chat_id, message_data, current_user, use_cache=use_cache, deadline=deadline)
+    # Сводку обновляем уже после отправки ответа
+    background_tasks.add_task(summary_service.refresh_if_needed, chat_id)
+    return message
 
+
+@router.post("/{chat_id}/messages/stream", response_class=StreamingResponse)
+async def stream_message_to_existing_chat(
+    chat_id: int,
+    message_data: MessageSchema,
+    deadline: Annotated[Deadline, Depends(request_deadline)],
+    current_user: Annotated[UserOut, Depends(get_current_user)],
+    background_tasks: BackgroundTasks,
+    chat_service: ChatService = Depends(get_chat_service),
+    summary_service: SummaryService = Depends(get_summary_service)
 ):
-    return await chat_service.send_message_to_chat(
-        chat_id, message_data, current_user)
+    events = await chat_service.stream_message_to_chat(
+        chat_id, message_data, current_user, deadline=deadline)
+    background_tasks.add_task(summary_service.refresh_if_needed, chat_id)
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=background_tasks,
+    )
 
 
-@router.get("/{chat_id}/messages", response_model=list[MessageOut])
+@router.get(
+    "/{chat_id}/messages",
+    response_model=list[MessageOut],
+    description=f'Messages in chronological order, latest page by default. Pass the '
+                f'{NEXT_CURSOR_HEADER} header value as `before` to load older messages '
+                '(or as `after` when paging forward).',
+)
 async def get_chat_messages(
     chat_id: int,
+    response: Response,
     current_user: Annotated[UserOut, Depends(get_current_user)],
-    chat_service: ChatService = Depends(get_chat_service)
+    chat_service: ChatService = Depends(get_chat_service),
+    limit: int = Query(50, ge=1, le=200),
+    before: int | None = None,
+    after: int | None = None
 ):
-    return await chat_service.get_chat_messages(chat_id, current_user)
+    messages, next_cursor = await chat_service.get_chat_messages(
+        chat_id, current_user, limit=limit, before=before, after=after)
+    if next_cursor is not None:
+        response.headers[NEXT_CURSOR_HEADER] = str(next_cursor)
+    return messages
@@ -0,0 +1,19 @@
+from fastapi import APIRouter, Response
+
+from app.api.routing import TimedRoute
+from app.core.metrics import render_metrics
+from app.services.openai import get_router
+
+router = APIRouter(tags=["Metrics"], route_class=TimedRoute)
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    content, content_type = render_metrics()
+    return Response(content=content, media_type=content_type)
+
+
+@router.get("/metrics/llm", include_in_schema=False)
+async def llm_providers():
+    # Состояние провайдеров в этом воркере: предохранитель, задержки, доля ошибок
+    return {"providers": get_router().snapshot()}
@@ -1,23 +1,89 @@
-from datetime import datetime
-from fastapi import Request, Response
-from app.core.my_logging import logger
-
-
-async def logging_middleware(request: Request, call_next):
-    start_time = datetime.now()
-    response = await call_next(request)
-    end_time = datetime.now()
-    logger.info(
-        f'{response.status_code} {request.client.host} {request.method} '
-        f'{request.url} {end_time - start_time}'
-    )
-    return response
-
-
-async def additional_processing(request: Request, call_next):
-    start_time = datetime.now()
-    response: Response = await call_next(request)
-    process_time = datetime.now() - start_time
-    if response.status_code // 100 == 4:
-        response.headers["X-ErrorHandleTime"] = str(process_time)
-    return response
+import time
+from datetime import timedelta
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.metrics import HTTP_LATENCY, HTTP_REQUESTS
+from app.core.my_logging import get_logger
+from app.utils.query_stats import QueryStats, start_query_stats
+from app.utils.timing import RequestTiming, start_request_timing
+
+access_logger = get_logger("access")
+
+
+def server_timing(timing: RequestTiming, query_stats: QueryStats, total: float) -> str:
+    """Значение заголовка Server-Timing, длительности в миллисекундах."""
+    entries = [
+        f"{phase};dur={seconds * 1000:.2f}"
+        for phase, seconds in timing.phases.items()
+    ]
+    if query_stats.count:
+        entries.append(
+            f'db;dur={query_stats.total_ms:.2f};desc="{query_stats.count} queries"')
+    entries.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(entries)
+
+
+class TimingMiddleware:
+    """Чистый ASGI-middleware: журнал запросов, метрики и Server-Timing.
+
+    Заменяет две функции на BaseHTTPMiddleware: не создает отдельную задачу
+    на запрос и меряет время по монотонным часам. Заголовки отражают то, что
+    успело произойти до начала ответа; для потоковых ответов журнал и
+    метрики получают полное время, включая отдачу тела.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        timing = start_request_timing()
+        query_stats = start_query_stats()
+        status_code = 500
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                elapsed = time.perf_counter() - started
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    "Server-Timing", server_timing(timing, query_stats, elapsed))
+                headers["X-DB-Queries"] = str(query_stats.count)
+                headers["X-DB-Time"] = f"{query_stats.total_ms:.2f}"
+                if status_code // 100 == 4:
+                    headers["X-ErrorHandleTime"] = str(timedelta(seconds=elapsed))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            elapsed = time.perf_counter() - started
+            self._record(scope, status_code, elapsed, query_stats)
+
+    @staticmethod
+    def _record(scope: Scope, status_code: int, elapsed: float, query_stats: QueryStats) -> None:
+        # Шаблон пути, а не URL: иначе каждый chat_id станет отдельной серией
+        route = scope.get("route")
+        route_path = route.path if route is not None else "unmatched"
+        method = scope["method"]
+        HTTP_REQUESTS.labels(method, route_path, status_code).inc()
+        HTTP_LATENCY.labels(method, route_path).observe(elapsed)
+
+        client = scope.get("client")
+        path = scope["path"]
+        if scope.get("query_string"):
+            path += "?" + scope["query_string"].decode("latin-1")
+        access_logger.info(
+            f'{status_code} {client[0] if client else "-"} {method} {path} '
+            f'{elapsed * 1000:.1f}ms db={query_stats.count}q/{query_stats.total_ms:.1f}ms',
+            extra={"duration_ms": round(elapsed * 1000, 2),
+                   "db_queries": query_stats.count,
+                   "db_time_ms": round(query_stats.total_ms, 2)},
+        )
@@ -0,0 +1,43 @@
+import functools
+import inspect
+import time
+from typing import Callable
+
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+
+from app.utils.timing import current_timing
+
+
+def _mark_endpoint_done(endpoint: Callable) -> Callable:
+    @functools.wraps(endpoint)
+    async def wrapper(*args, **kwargs):
+        result = await endpoint(*args, **kwargs)
+        timing = current_timing()
+        if timing is not None:
+            timing.endpoint_done = time.perf_counter()
+        return result
+    return wrapper
+
+
+class TimedRoute(APIRoute):
+    """Маршрут, который записывает фазу serialization: время от возврата из
+    эндпоинта до готового Response (валидация response_model и JSON)."""
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        # functools.wraps сохраняет сигнатуру, зависимости FastAPI не меняются
+        if inspect.iscoroutinefunction(endpoint):
+            endpoint = _mark_endpoint_done(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def timed_handler(request: Request) -> Response:
+            response = await handler(request)
+            timing = current_timing()
+            if timing is not None and timing.endpoint_done is not None:
+                timing.add("serialization", time.perf_counter() - timing.endpoint_done)
+            return response
+
+        return timed_handler
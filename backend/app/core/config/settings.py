@@ -25,13 +25,130 @@ class Settings(BaseSettings):
 
     
     TEST_DATABASE_URL: str = f"mysql+aiomysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{TEST_DB_NAME}"
+    # Пул соединений: pool_size постоянных + max_overflow временных; соединения
+    # старше DB_POOL_RECYCLE секунд пересоздаются раньше, чем их закроет MySQL
+    # по wait_timeout, а pre-ping проверяет соединение перед выдачей
+    DB_POOL_SIZE: int = env.int("DB_POOL_SIZE", 10)
+    DB_MAX_OVERFLOW: int = env.int("DB_MAX_OVERFLOW", 20)
+    DB_POOL_RECYCLE: int = env.int("DB_POOL_RECYCLE", 1800)
+    DB_POOL_PRE_PING: bool = env.bool("DB_POOL_PRE_PING", True)
+    DB_POOL_TIMEOUT: float = env.float("DB_POOL_TIMEOUT", 30.0)
+    # Сколько соединений открыть при старте приложения
+    DB_POOL_WARMUP: int = env.int("DB_POOL_WARMUP", 10)
+    # Печать всех SQL-запросов (только для отладки)
+    DB_ECHO: bool = env.bool("DB_ECHO", False)
+    # Запросы дольше порога попадают в лог с типами параметров и планом EXPLAIN.
+    # Значения параметров (в них тексты сообщений пользователей) пишутся
+    # отдельной записью уровня DEBUG и только при DB_SLOW_QUERY_LOG_PARAMS
+    DB_SLOW_QUERY_MS: float = env.float("DB_SLOW_QUERY_MS", 200.0)
+    DB_SLOW_QUERY_EXPLAIN: bool = env.bool("DB_SLOW_QUERY_EXPLAIN", True)
+    DB_SLOW_QUERY_LOG_PARAMS: bool = env.bool("DB_SLOW_QUERY_LOG_PARAMS", False)
 
     # JWT
     SECRET_KEY: str = env.str("SECRET_KEY", "your_secret_key")
+    # Стоимость bcrypt; при ее смене хеши пересчитываются при следующем входе
+    BCRYPT_ROUNDS: int = env.int("BCRYPT_ROUNDS", 12)
+    # Хеширование паролей идет в отдельном пуле потоков; сверх
+    # PASSWORD_HASH_MAX_PENDING ожидающих операций запросы получают 503
+    PASSWORD_HASH_WORKERS: int = env.int(
+        "PASSWORD_HASH_WORKERS", min(4, os.cpu_count() or 1))
+    PASSWORD_HASH_MAX_PENDING: int = env.int("PASSWORD_HASH_MAX_PENDING", 64)
+    # Кеш пользователей, найденных по токену: сколько держать и сколько секунд
+    PRINCIPAL_CACHE_SIZE: int = env.int("PRINCIPAL_CACHE_SIZE", 10000)
+    PRINCIPAL_CACHE_TTL: float = env.float("PRINCIPAL_CACHE_TTL", 60.0)
     # OpenAI
     GPT_API_KEY: str = os.getenv("GPT_API_KEY")
     GPT_URL: str = os.getenv("GPT_URL")
-    
+    GPT_MODEL: str = env.str("GPT_MODEL", "qwen-plus")
+    # Несколько OpenAI-совместимых провайдеров, JSON-список
+    # [{"name": "...", "base_url": "...", "api_key": "...", "model": "..."}];
+    # model необязателен. Пустой список — один провайдер из GPT_URL/GPT_API_KEY
+    GPT_PROVIDERS: list[dict] = env.json("GPT_PROVIDERS", [])
+    # Ранжирование провайдеров: сглаживание EWMA задержки и доли ошибок;
+    # каждая ошибка стоит LLM_PROVIDER_FAILURE_PENALTY секунд в оценке.
+    # Провайдер, к которому не обращались LLM_PROVIDER_STALE_AFTER секунд,
+    # снова пробуется первым
+    LLM_PROVIDER_EWMA_ALPHA: float = env.float("LLM_PROVIDER_EWMA_ALPHA", 0.2)
+    LLM_PROVIDER_FAILURE_PENALTY: float = env.float("LLM_PROVIDER_FAILURE_PENALTY", 1.0)
+    LLM_PROVIDER_STALE_AFTER: float = env.float("LLM_PROVIDER_STALE_AFTER", 60.0)
+    # Предохранитель провайдера: размыкается, когда за последние
+    # LLM_CIRCUIT_WINDOW секунд было не меньше LLM_CIRCUIT_MIN_CALLS вызовов и
+    # доля ошибок достигла LLM_CIRCUIT_ERROR_RATE или доля вызовов дольше
+    # LLM_CIRCUIT_SLOW_CALL секунд — LLM_CIRCUIT_SLOW_RATE. Разомкнутый отказывает
+    # LLM_CIRCUIT_OPEN_FOR секунд, затем пропускает LLM_CIRCUIT_HALF_OPEN_CALLS
+    # пробных вызовов
+    LLM_CIRCUIT_WINDOW: float = env.float("LLM_CIRCUIT_WINDOW", 30.0)
+    LLM_CIRCUIT_MIN_CALLS: int = env.int("LLM_CIRCUIT_MIN_CALLS", 5)
+    LLM_CIRCUIT_ERROR_RATE: float = env.float("LLM_CIRCUIT_ERROR_RATE", 0.5)
+    LLM_CIRCUIT_SLOW_CALL: float = env.float("LLM_CIRCUIT_SLOW_CALL", 30.0)
+    LLM_CIRCUIT_SLOW_RATE: float = env.float("LLM_CIRCUIT_SLOW_RATE", 0.8)
+    LLM_CIRCUIT_OPEN_FOR: float = env.float("LLM_CIRCUIT_OPEN_FOR", 30.0)
+    LLM_CIRCUIT_HALF_OPEN_CALLS: int = env.int("LLM_CIRCUIT_HALF_OPEN_CALLS", 1)
+    # Дедлайн запроса к LLM в секундах, считая от начала HTTP-запроса: из
+    # остатка берутся таймауты попыток, ожидание лимитов и паузы повторов.
+    # Одна попытка — не дольше LLM_ATTEMPT_TIMEOUT, подключение — не дольше
+    # LLM_CONNECT_TIMEOUT
+    LLM_REQUEST_DEADLINE: float = env.float("LLM_REQUEST_DEADLINE", 60.0)
+    LLM_ATTEMPT_TIMEOUT: float = env.float("LLM_ATTEMPT_TIMEOUT", 30.0)
+    LLM_CONNECT_TIMEOUT: float = env.float("LLM_CONNECT_TIMEOUT", 3.0)
+    # Повторы: всего не больше LLM_MAX_ATTEMPTS попыток, повтор у уже
+    # опробованного провайдера — после паузы со случайной долей от
+    # LLM_RETRY_BACKOFF_BASE * 2^n (не больше LLM_RETRY_BACKOFF_MAX). Бюджет:
+    # повторов не больше LLM_RETRY_BUDGET_RATIO от числа запросов плюс
+    # LLM_RETRY_BUDGET_MIN_PER_SECOND в секунду
+    LLM_MAX_ATTEMPTS: int = env.int("LLM_MAX_ATTEMPTS", 3)
+    LLM_RETRY_BACKOFF_BASE: float = env.float("LLM_RETRY_BACKOFF_BASE", 0.2)
+    LLM_RETRY_BACKOFF_MAX: float = env.float("LLM_RETRY_BACKOFF_MAX", 2.0)
+    LLM_RETRY_BUDGET_RATIO: float = env.float("LLM_RETRY_BUDGET_RATIO", 0.1)
+    LLM_RETRY_BUDGET_MIN_PER_SECOND: float = env.float("LLM_RETRY_BUDGET_MIN_PER_SECOND", 1.0)
+    # Хеджирование: если ответ (для потока — первый фрагмент) не пришел за
+    # LLM_HEDGE_PERCENTILE-й перцентиль задержки провайдера по последним
+    # LLM_HEDGE_WINDOW вызовам (но не раньше LLM_HEDGE_MIN_DELAY секунд),
+    # отправляется дубль. Пока замеров меньше LLM_HEDGE_MIN_SAMPLES, дублей нет.
+    # Дублей не больше LLM_HEDGE_MAX_RATE от числа запросов
+    LLM_HEDGE_ENABLED: bool = env.bool("LLM_HEDGE_ENABLED", False)
+    LLM_HEDGE_PERCENTILE: float = env.float("LLM_HEDGE_PERCENTILE", 95.0)
+    LLM_HEDGE_MIN_DELAY: float = env.float("LLM_HEDGE_MIN_DELAY", 0.1)
+    LLM_HEDGE_WINDOW: int = env.int("LLM_HEDGE_WINDOW", 200)
+    LLM_HEDGE_MIN_SAMPLES: int = env.int("LLM_HEDGE_MIN_SAMPLES", 20)
+    LLM_HEDGE_MAX_RATE: float = env.float("LLM_HEDGE_MAX_RATE", 0.05)
+    # Бюджет контекста в токенах; для отдельных моделей — JSON {"model": tokens}
+    LLM_CONTEXT_TOKEN_BUDGET: int = env.int("LLM_CONTEXT_TOKEN_BUDGET", 6000)
+    LLM_MODEL_TOKEN_BUDGETS: dict[str, int] = env.json(
+        "LLM_MODEL_TOKEN_BUDGETS", {})
+    # Сколько последних сообщений читать из БД как кандидатов в контекст
+    LLM_CONTEXT_MAX_MESSAGES: int = env.int("LLM_CONTEXT_MAX_MESSAGES", 100)
+    # Сводка чата: обновляется, когда после нее накопилось SUMMARY_TRIGGER_MESSAGES
+    # сообщений; последние SUMMARY_KEEP_RECENT остаются в контексте как есть
+    SUMMARY_TRIGGER_MESSAGES: int = env.int("SUMMARY_TRIGGER_MESSAGES", 30)
+    SUMMARY_KEEP_RECENT: int = env.int("SUMMARY_KEEP_RECENT", 10)
+    # Кеш ответов LLM по точному совпадению модели и сообщений
+    LLM_CACHE_ENABLED: bool = env.bool("LLM_CACHE_ENABLED", True)
+    LLM_CACHE_SIZE: int = env.int("LLM_CACHE_SIZE", 1024)
+    LLM_CACHE_TTL: float = env.float("LLM_CACHE_TTL", 3600.0)
+    # Пул HTTP-соединений к провайдеру (общий на весь воркер)
+    LLM_MAX_CONNECTIONS: int = env.int("LLM_MAX_CONNECTIONS", 100)
+    LLM_MAX_KEEPALIVE_CONNECTIONS: int = env.int(
+        "LLM_MAX_KEEPALIVE_CONNECTIONS", 20)
+    LLM_KEEPALIVE_EXPIRY: float = env.float("LLM_KEEPALIVE_EXPIRY", 30.0)
+    # Лимиты обращений к LLM в минуту: общие на воркер и на пользователя,
+    # по запросам и по оценке токенов (промпт + LLM_RATE_COMPLETION_TOKENS
+    # на ответ); 0 — без лимита. Запрос ждет свободного места не дольше
+    # LLM_RATE_LIMIT_MAX_WAIT секунд, иначе получает 429
+    LLM_RATE_LIMIT_ENABLED: bool = env.bool("LLM_RATE_LIMIT_ENABLED", True)
+    LLM_GLOBAL_REQUESTS_PER_MINUTE: float = env.float("LLM_GLOBAL_REQUESTS_PER_MINUTE", 600)
+    LLM_GLOBAL_TOKENS_PER_MINUTE: float = env.float("LLM_GLOBAL_TOKENS_PER_MINUTE", 400000)
+    LLM_USER_REQUESTS_PER_MINUTE: float = env.float("LLM_USER_REQUESTS_PER_MINUTE", 20)
+    LLM_USER_TOKENS_PER_MINUTE: float = env.float("LLM_USER_TOKENS_PER_MINUTE", 40000)
+    LLM_RATE_LIMIT_MAX_WAIT: float = env.float("LLM_RATE_LIMIT_MAX_WAIT", 5.0)
+    LLM_RATE_COMPLETION_TOKENS: int = env.int("LLM_RATE_COMPLETION_TOKENS", 512)
+    # Фоновые генерации (?background=true): сколько вызовов LLM идет
+    # одновременно, сколько незавершенных задач принимать до 503 и сколько
+    # секунд хранить результат для опроса
+    GENERATION_WORKERS: int = env.int("GENERATION_WORKERS", 16)
+    GENERATION_MAX_PENDING: int = env.int("GENERATION_MAX_PENDING", 256)
+    GENERATION_JOB_TTL: float = env.float("GENERATION_JOB_TTL", 600.0)
+
     # FastAPI
     API_V1_STR: str = '/api/v1'
     TITLE: str = 'Gpt Service'
@@ -43,6 +160,14 @@ class Settings(BaseSettings):
 
     # Logging
     LOG_FILENAME: str = os.getenv("LOG_FILENAME", "gpt_service.log")
+    # Запись логов в фоновом потоке через очередь, а не в event loop
+    LOG_QUEUE: bool = env.bool("LOG_QUEUE", True)
+    # JSON-строки вместо текстового формата (для сборщиков логов)
+    LOG_JSON: bool = env.bool("LOG_JSON", False)
+    # Уровни отдельных логгеров, JSON {"app.access": "WARNING", ...}
+    LOG_LEVELS: dict[str, str] = env.json("LOG_LEVELS", {})
+    # Доля сохраняемых INFO/DEBUG записей по логгерам, JSON {"app.access": 0.1}
+    LOG_SAMPLING: dict[str, float] = env.json("LOG_SAMPLING", {})
 
 
 settings = Settings(DEBUG=True)
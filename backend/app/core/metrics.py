@@ -0,0 +1,102 @@
+"""Метрики Prometheus.
+
+Под несколькими воркерами uvicorn задайте PROMETHEUS_MULTIPROC_DIR (пустой
+каталог, общий для воркеров) до запуска: prometheus_client тогда хранит
+значения в mmap-файлах, а /metrics собирает их со всех процессов.
+Запись метрики — это инкремент в памяти процесса, без ввода-вывода.
+"""
+import os
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client import multiprocess
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+TOKEN_BUCKETS = (16, 64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests by route and status",
+    ["method", "route", "status"])
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route",
+    ["method", "route"], buckets=LATENCY_BUCKETS)
+
+LLM_LATENCY = Histogram(
+    "llm_request_duration_seconds", "Upstream LLM call latency per provider attempt",
+    ["provider", "model", "mode", "outcome"], buckets=LATENCY_BUCKETS)
+LLM_TOKENS = Histogram(
+    "llm_tokens", "Tokens per LLM call reported by the provider",
+    ["provider", "model", "kind"], buckets=TOKEN_BUCKETS)
+LLM_FAILOVERS = Counter(
+    "llm_failovers_total", "Requests moved to the next provider after an error",
+    ["provider", "error"])
+LLM_RETRIES = Counter(
+    "llm_retries_total", "Repeated calls to a provider after backoff",
+    ["provider", "error"])
+LLM_RETRY_BUDGET_EXHAUSTED = Counter(
+    "llm_retry_budget_exhausted_total", "Retries skipped because the retry budget ran out")
+LLM_HEDGES = Counter(
+    "llm_hedges_total", "Duplicate calls sent because the first one was slow", ["mode"])
+LLM_HEDGE_WINS = Counter(
+    "llm_hedge_wins_total", "Which call of a hedged pair answered first", ["mode", "winner"])
+# 0 — замкнут, 1 — полуоткрыт, 2 — разомкнут; берется худшее по воркерам
+CIRCUIT_STATE = Gauge(
+    "circuit_breaker_state", "Circuit breaker state: 0 closed, 1 half-open, 2 open",
+    ["breaker"], multiprocess_mode="livemax")
+
+RATE_LIMIT_WAIT = Histogram(
+    "llm_rate_limit_wait_seconds", "Time LLM calls were queued by the local rate limiter",
+    buckets=LATENCY_BUCKETS)
+RATE_LIMIT_REJECTED = Counter(
+    "llm_rate_limit_rejected_total", "LLM calls rejected by the local rate limiter",
+    ["scope", "kind"])
+GENERATION_JOBS = Counter(
+    "generation_jobs_total", "Finished background generation jobs", ["status"])
+GENERATION_JOBS_ACTIVE = Gauge(
+    "generation_jobs_active", "Background generation jobs queued or running",
+    multiprocess_mode="livesum")
+
+# Состояние пула у каждого воркера свое; livesum складывает живые процессы
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out", "DB connections currently checked out",
+    multiprocess_mode="livesum")
+DB_POOL_OVERFLOW = Gauge(
+    "db_pool_overflow", "DB connections open above pool_size",
+    multiprocess_mode="livesum")
+
+# Доля попаданий: rate(cache_requests_total{result="hit"}) / rate(cache_requests_total)
+CACHE_REQUESTS = Counter(
+    "cache_requests_total", "Cache lookups by result", ["cache", "result"])
+
+
+def observe_pool(pool, returning: bool = False) -> None:
+    """Обновляет гауги пула. Событие checkin приходит до фактического
+    возврата соединения, поэтому returning учитывает его заранее."""
+    if not hasattr(pool, "checkedout"):
+        return
+    checked_out = pool.checkedout()
+    overflow = pool.overflow()
+    if returning:
+        checked_out -= 1
+        # В заполненную очередь соединение не вернется, а будет закрыто
+        if pool.checkedin() >= pool.size():
+            overflow -= 1
+    DB_POOL_CHECKED_OUT.set(checked_out)
+    DB_POOL_OVERFLOW.set(max(overflow, 0))
+
+
+def render_metrics() -> tuple[bytes, str]:
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
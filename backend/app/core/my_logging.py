@@ -1,39 +1,116 @@
+import atexit
+import json
 import logging
 import os
+import queue
+import random
 
+from datetime import datetime, timezone
 from logging import Logger, handlers
 
 from app.core.config.settings import settings, LOG_PATH
 
+# Атрибуты, которые есть у любой LogRecord; все остальное пришло через extra
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
 
-def get_log() -> Logger:
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись — одна JSON-строка; поля из extra попадают в объект."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "location": f"{record.filename}:{record.lineno}",
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                data[key] = value
+        if record.exc_info:
+            data["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Пропускает заданную долю INFO/DEBUG записей горячих логгеров.
+
+    Доля задается по префиксу имени логгера, побеждает самый длинный префикс.
+    WARNING и выше не отбрасываются никогда.
+    """
+
+    def __init__(self, rates: dict[str, float]):
+        super().__init__()
+        self.rates = sorted(rates.items(), key=lambda item: -len(item[0]))
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.INFO:
+            return True
+        for prefix, rate in self.rates:
+            if record.name == prefix or record.name.startswith(prefix + "."):
+                return random.random() < rate
+        return True
+
+
+def _build_handlers() -> list[logging.Handler]:
     if not os.path.exists(LOG_PATH):
         os.mkdir(LOG_PATH)
 
     log_file = os.path.join(LOG_PATH, settings.LOG_FILENAME)
 
-    file_formatter = logging.Formatter(
-        '%(asctime)s %(levelname)s %(filename)s %(lineno)d %(message)s'
-    )
+    if settings.LOG_JSON:
+        file_formatter = console_formatter = JsonFormatter()
+    else:
+        file_formatter = logging.Formatter(
+            '%(asctime)s %(levelname)s %(name)s %(filename)s %(lineno)d %(message)s'
+        )
+        console_formatter = logging.Formatter(
+            '%(levelname)s -- %(filename)s -- %(message)s'
+        )
     file_handler = handlers.RotatingFileHandler(
         log_file, maxBytes=50000000, backupCount=5
     )
     file_handler.setLevel(logging.INFO)
     file_handler.setFormatter(file_formatter)
 
-    console_formatter = logging.Formatter(
-        '%(levelname)s -- %(filename)s -- %(message)s'
-    )
     console_handler = logging.StreamHandler()
     console_handler.setLevel(logging.DEBUG if settings.DEBUG else logging.INFO)
     console_handler.setFormatter(console_formatter)
+    return [file_handler, console_handler]
+
 
-    log = logging.getLogger(__name__)
-    log.addHandler(file_handler)
-    log.addHandler(console_handler)
+def get_log() -> Logger:
+    log = logging.getLogger("app")
     log.setLevel(logging.DEBUG if settings.DEBUG else logging.INFO)
+    log.propagate = False
+
+    output = _build_handlers()
+    if settings.LOG_QUEUE:
+        # В запросе запись только кладется в очередь; форматирование и
+        # дисковый ввод-вывод выполняет поток QueueListener
+        log_queue = queue.SimpleQueue()
+        listener = handlers.QueueListener(
+            log_queue, *output, respect_handler_level=True)
+        listener.start()
+        atexit.register(listener.stop)
+        output = [handlers.QueueHandler(log_queue)]
+
+    for handler in output:
+        # Сэмплинг до постановки в очередь: отброшенная запись ничего не стоит
+        if settings.LOG_SAMPLING:
+            handler.addFilter(SamplingFilter(settings.LOG_SAMPLING))
+        log.addHandler(handler)
+
+    for name, level in settings.LOG_LEVELS.items():
+        logging.getLogger(name).setLevel(level.upper())
 
     return log
 
 
-logger = get_log()
\ No newline at end of file
+def get_logger(name: str) -> Logger:
+    """Дочерний логгер app.<name>: свой уровень и сэмплинг, общие обработчики."""
+    return logger.getChild(name)
+
+
+logger = get_log()
@@ -4,10 +4,17 @@ from typing import Annotated
 
 from datetime import datetime, timedelta, timezone
 from fastapi import Depends, HTTPException, status
-from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.security import OAuth2PasswordBearer
 from app.core.config.settings import settings
-from app.database import get_user, get_db
+from app.core.security.principal_cache import (
+    cache_principal,
+    principal_cache,
+    principal_key,
+    principal_read_started,
+)
+from app.database import async_session_maker, get_user
+from app.schemas.user import UserOut
+from app.utils.timing import timed
 
 SECRET_KEY = settings.SECRET_KEY
 ALGORITHM = "HS256"
@@ -48,32 +55,45 @@ async def decode_access_token(token: str) -> dict:
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
 
 
+async def get_principal(email: str) -> UserOut | None:
+    """Пользователь по subject токена: из кеша, а при промахе — из БД."""
+    key = principal_key(email)
+    user = await principal_cache.get(key)
+    if user is not None:
+        return user
+    started = principal_read_started()
+    # Сессия открывается только при промахе кеша
+    async with async_session_maker() as session:
+        user = await get_user(email=email, session=session)
+    if not user:
+        return None
+    await cache_principal(key, user, started)
+    return user
+
+
 async def get_current_user(
     token: Annotated[str, Depends(oauth2_scheme)],
-    session: AsyncSession = Depends(get_db)
-):
+) -> UserOut:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload: dict = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
+    with timed("auth"):
+        try:
+            payload: dict = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            email: str = payload.get("sub")
+            if email is None:
+                raise credentials_exception
+        except jwt.InvalidTokenError:
             raise credentials_exception
-    except jwt.InvalidTokenError:
-        raise credentials_exception
-    user = await get_user(email=email, session=session)
-    if user is None:
+        user = await get_principal(email)
+    if user is None or not user.is_active:
         raise credentials_exception
     return user
 
 
-async def refresh_jwt(
-    refresh_token: str,
-    session: AsyncSession = Depends(get_db)
-):
+async def refresh_jwt(refresh_token: str):
     try:
         payload: dict = jwt.decode(
             refresh_token, SECRET_KEY, algorithms=[ALGORITHM])
@@ -100,8 +120,8 @@ async def refresh_jwt(
             detail="Invalid token",
         )
 
-    user = await get_user(email=email, session=session)
-    if user is None:
+    user = await get_principal(email)
+    if user is None or not user.is_active:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found",
@@ -0,0 +1,73 @@
+import time
+
+from app.core.config.settings import settings
+from app.utils.cache import AbstractCache, InMemoryCache
+
+# Пользователи (UserOut), уже найденные по subject токена. Запись живет не
+# дольше PRINCIPAL_CACHE_TTL, а при изменении пользователя удаляется явно.
+# Кеш и его сброс свои в каждом процессе: другие воркеры uvicorn видят
+# изменение (например, деактивацию) только по истечении PRINCIPAL_CACHE_TTL,
+# поэтому TTL и есть предел задержки для них
+principal_cache: AbstractCache = InMemoryCache(
+    maxsize=settings.PRINCIPAL_CACHE_SIZE,
+    ttl=settings.PRINCIPAL_CACHE_TTL,
+    name="principal",
+)
+
+
+def principal_key(email: str) -> str:
+    return f"principal:{email}"
+
+
+# Время последнего сброса по ключу: промах кеша, прочитавший пользователя до
+# коммита изменений, не должен положить прочитанное в кеш после сброса.
+# Отметки старше PRINCIPAL_CACHE_TTL выбрасываются, порядок вставки — по времени
+_invalidated: dict[str, float] = {}
+
+
+def principal_read_started() -> float:
+    """Отметка начала чтения пользователя из БД для cache_principal."""
+    return time.monotonic()
+
+
+async def cache_principal(key: str, user, started: float) -> None:
+    """Кладет пользователя в кеш, если с начала чтения его не сбрасывали.
+    Чтение дольше TTL не кешируется: отметка о сбросе могла быть уже выброшена."""
+    now = time.monotonic()
+    if now - started > settings.PRINCIPAL_CACHE_TTL:
+        return
+    if _invalidated.get(key, float("-inf")) >= started:
+        return
+    await principal_cache.set(key, user)
+
+
+def _prune_invalidated(now: float) -> None:
+    expired_before = now - settings.PRINCIPAL_CACHE_TTL
+    while _invalidated:
+        key, invalidated_at = next(iter(_invalidated.items()))
+        if invalidated_at >= expired_before:
+            break
+        del _invalidated[key]
+
+
+async def invalidate_principal(email: str) -> None:
+    key = principal_key(email)
+    now = time.monotonic()
+    _prune_invalidated(now)
+    _invalidated.pop(key, None)
+    _invalidated[key] = now
+    await principal_cache.delete(key)
+
+
+# Изменения пользователя видны другим запросам только после коммита, поэтому
+# репозиторий лишь помечает email в сессии, а сбрасывает кеш UnitOfWork.commit
+_CHANGED_KEY = "changed_principals"
+
+
+def mark_principal_changed(session, email: str) -> None:
+    session.info.setdefault(_CHANGED_KEY, set()).add(email)
+
+
+async def invalidate_changed_principals(session) -> None:
+    for email in session.info.pop(_CHANGED_KEY, ()):
+        await invalidate_principal(email)
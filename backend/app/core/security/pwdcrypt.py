@@ -1,11 +1,66 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from fastapi import HTTPException, status
 from passlib.context import CryptContext
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from app.core.config.settings import settings
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=settings.BCRYPT_ROUNDS,
+)
+
+# bcrypt отпускает GIL, поэтому отдельный пул потоков снимает с event loop
+# сотни миллисекунд CPU на каждый вход и не мешает общему пулу asyncio
+executor: ThreadPoolExecutor | None = None
+_pending = 0
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global executor
+    if executor is None:
+        executor = ThreadPoolExecutor(
+            max_workers=settings.PASSWORD_HASH_WORKERS,
+            thread_name_prefix="bcrypt",
+        )
+    return executor
+
+
+def shutdown_executor() -> None:
+    global executor
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+        executor = None
+
+
+async def _run(fn, *args):
+    """Выполняет fn в пуле bcrypt, отклоняя запрос, если очередь переполнена."""
+    global _pending
+    if _pending >= settings.PASSWORD_HASH_MAX_PENDING:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many authentication requests, try again later",
+            headers={"Retry-After": "1"},
+        )
+    _pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_executor(), partial(fn, *args))
+    finally:
+        _pending -= 1
 
 
 async def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return await _run(pwd_context.verify, plain_password, hashed_password)
+
+
+async def verify_and_update(plain_password, hashed_password) -> tuple[bool, str | None]:
+    """Проверяет пароль; второй элемент — новый хеш, если сменилась стоимость."""
+    return await _run(pwd_context.verify_and_update, plain_password, hashed_password)
 
 
-def password_hasher(password: str):
-    return pwd_context.hash(password)
+async def password_hasher(password: str):
+    return await _run(pwd_context.hash, password)
@@ -1,10 +1,52 @@
-from sqlalchemy import select
+import asyncio
+from contextlib import AsyncExitStack
+
+from sqlalchemy import event, select, text
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from app.core.config.settings import settings
+from app.core.metrics import observe_pool
+from app.core.my_logging import get_logger
 from app.models.user import User
+from app.utils.query_stats import instrument_engine
+
+logger = get_logger("db")
+
+
+def _pool_options(url: str) -> dict:
+    # SQLite в памяти живет на одном соединении (StaticPool), у него нет
+    # размеров пула; это только тесты и скрипты
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        return {}
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+    }
+
+
+engine = create_async_engine(
+    settings.DATABASE_URL,
+    echo=settings.DB_ECHO,
+    **_pool_options(settings.DATABASE_URL),
+)
+instrument_engine(engine.sync_engine)
 
-engine = create_async_engine(settings.DATABASE_URL, echo=True)
+
+# Гауги пула обновляются при выдаче и возврате соединения, а не при опросе
+# /metrics: опрос попадает в один воркер, а значения нужны от всех
+@event.listens_for(engine.sync_engine, "checkout")
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    observe_pool(engine.sync_engine.pool)
+
+
+@event.listens_for(engine.sync_engine, "checkin")
+def _on_checkin(dbapi_connection, connection_record):
+    observe_pool(engine.sync_engine.pool, returning=True)
 
 async_session_maker = sessionmaker(
     bind=engine,
@@ -13,6 +55,26 @@ async_session_maker = sessionmaker(
 )
 
 
+async def warm_up_pool(connections: int = settings.DB_POOL_WARMUP) -> None:
+    """Открывает соединения заранее, чтобы первые запросы после деплоя не
+    платили за подключение. Ошибка не мешает старту: пул наполнится сам."""
+    connections = min(connections, settings.DB_POOL_SIZE)
+    if connections <= 0:
+        return
+    try:
+        async with AsyncExitStack() as stack:
+            # Все соединения держим одновременно, иначе пул выдавал бы одно и то же
+            conns = await asyncio.gather(*(
+                stack.enter_async_context(engine.connect())
+                for _ in range(connections)
+            ))
+            for conn in conns:
+                await conn.execute(text("SELECT 1"))
+        logger.info(f"DB pool warmed up with {connections} connections")
+    except Exception as e:
+        logger.warning(f"DB pool warm-up failed: {e}")
+
+
 async def get_db():
     async with async_session_maker() as session:
         yield session
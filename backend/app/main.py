@@ -1,12 +1,32 @@
+from contextlib import asynccontextmanager
 from fastapi.exceptions import RequestValidationError
 import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.auth import router as auth_router
 from app.api.chat import router as chat_router
+from app.api.metrics import router as metrics_router
 from app.core.exceptions.exceptions_handlers import validation_exception_handler
 from app.core.config.settings import settings
-from app.api.middleware.middleware import  additional_processing, logging_middleware
+from app.api.middleware.middleware import TimingMiddleware
+from app.database import engine, warm_up_pool
+from app.services.openai import init_llm_client, close_llm_client
+from app.services.generation_jobs import generation_jobs
+from app.core.security.pwdcrypt import shutdown_executor
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Общие пулы соединений к LLM-провайдеру и к БД живут столько же,
+    # сколько приложение
+    await init_llm_client()
+    await warm_up_pool()
+    yield
+    # Незавершенные фоновые генерации отменяем до закрытия их соединений
+    await generation_jobs.stop()
+    await close_llm_client()
+    await engine.dispose()
+    shutdown_executor()
 
 
 app = FastAPI(
@@ -15,20 +35,23 @@ app = FastAPI(
     version=settings.VERSION,
     docs_url=settings.DOCS_URL,
     redoc_url=settings.REDOCS_URL,
-    openapi_url="/openapi.json")
+    openapi_url="/openapi.json",
+    lifespan=lifespan)
 app.include_router(auth_router)
 app.include_router(chat_router)
+app.include_router(metrics_router)
 app.add_exception_handler(RequestValidationError, validation_exception_handler)
 # Разрешаем CORS для фронтенда
 
-app.middleware("http")(logging_middleware)
-app.middleware("http")(additional_processing)
+app.add_middleware(TimingMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://127.0.0.1:3000"],  # 🔥 Разрешаем запросы с фронта
     allow_credentials=True,
     allow_methods=["*"],  # ✅ Разрешаем все методы (GET, POST, etc.)
     allow_headers=["*"],  # ✅ Разрешаем любые заголовки
+    # Курсор пагинации и тайминги запроса должны быть видны фронту
+    expose_headers=["X-Next-Cursor", "X-DB-Queries", "X-DB-Time", "Server-Timing"],
 )
 
 
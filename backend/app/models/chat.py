@@ -1,17 +1,23 @@
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import ForeignKey, String, Integer, Text
+from sqlalchemy import ForeignKey, Index, String, Integer, Text
 from app.models.base import Base
 from app.schemas.chat import ChatOut, MessageOut
 
 
 class Chat(Base):
     __tablename__ = "chats"
+    # Список чатов пользователя: WHERE owner_id = ? ORDER BY id
+    __table_args__ = (Index("ix_chats_owner_id_id", "owner_id", "id"),)
 
     id: Mapped[int] = mapped_column(
         Integer, primary_key=True, autoincrement=True)
     title: Mapped[str] = mapped_column(String(255), nullable=False)
     owner_id: Mapped[int] = mapped_column(
         ForeignKey("users.id"), nullable=False)
+    # Сжатое содержание старой части переписки и id последнего вошедшего в него сообщения
+    summary: Mapped[str | None] = mapped_column(Text, nullable=True)
+    summary_message_id: Mapped[int | None] = mapped_column(
+        Integer, nullable=True)
 
     messages = relationship("Message", back_populates="chat")
 
@@ -25,6 +31,8 @@ class Chat(Base):
 
 class Message(Base):
     __tablename__ = "messages"
+    # История чата: WHERE chat_id = ? AND id < / > ? ORDER BY id
+    __table_args__ = (Index("ix_messages_chat_id_id", "chat_id", "id"),)
 
     id: Mapped[int] = mapped_column(
         Integer, primary_key=True, autoincrement=True)
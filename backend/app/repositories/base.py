@@ -2,14 +2,16 @@ from abc import ABC, abstractmethod
 from typing import Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.schema import Table
-from sqlalchemy import select, insert, update, delete
+from sqlalchemy import select, update, delete
 from sqlalchemy.exc import (
     IntegrityError, NoResultFound, 
     MultipleResultsFound, DBAPIError
     )
-from app.core.my_logging import logger
+from app.core.my_logging import get_logger
 from app.core.exceptions.exceptions import NoRowsFoundError, DBError
 
+logger = get_logger("repositories")
+
 
 class AbstractRepository(ABC):
 
@@ -17,6 +19,10 @@ class AbstractRepository(ABC):
     async def add_one(self, data: dict):
         raise NotImplementedError
 
+    @abstractmethod
+    async def add_many(self, data: list[dict]):
+        raise NotImplementedError
+
     @abstractmethod
     async def get_one(self, id: int):
         raise NotImplementedError
@@ -41,24 +47,37 @@ class SQLAlchemyRepository(AbstractRepository):
         self.session = session
 
     async def add_one(self, data: dict):
-        # Шаг 1: Вставка данных
-        stmt_insert = insert(self.model).values(**data)
+        # Первичный ключ берется из самого INSERT (lastrowid или RETURNING),
+        # без повторных SELECT — и без риска прочитать чужую строку
+        created_instance = self.model(**data)
         try:
-            await self.session.execute(stmt_insert)
+            self.session.add(created_instance)
+            await self.session.flush()
 
-            # Шаг 2: Получение только что созданной записи
-            last_id_stmt = select(self.model.id).order_by(
-                self.model.id.desc()).limit(1)
-            result = await self.session.execute(last_id_stmt)
-            last_id = result.scalar_one()
+            # Без самих данных: в них тексты сообщений пользователей
+            logger.debug(
+                f"Created {self.model.__name__} with id {created_instance.id}")
+            return created_instance
 
-            # Шаг 3: Выборка полной записи по ID
-            select_stmt = select(self.model).where(self.model.id == last_id)
-            full_result = await self.session.execute(select_stmt)
-            created_instance = full_result.scalar_one()
+        except IntegrityError as e:
+            logger.error(f"IntegrityError in {self.model.__name__}: {str(e)}")
+            raise
+        except DBAPIError as e:
+            logger.error(
+                f"Unexpected error in {self.model.__name__}: {str(e)}")
+            raise
 
-            logger.info(f"Created {self.model.__name__} with data: {data}")
-            return created_instance
+    async def add_many(self, data: list[dict]) -> list:
+        # Один flush на все строки: там, где диалект умеет INSERT ... RETURNING,
+        # SQLAlchemy отправит их одним многострочным INSERT
+        created_instances = [self.model(**item) for item in data]
+        try:
+            self.session.add_all(created_instances)
+            await self.session.flush()
+
+            logger.debug(
+                f"Created {len(created_instances)} {self.model.__name__} rows")
+            return created_instances
 
         except IntegrityError as e:
             logger.error(f"IntegrityError in {self.model.__name__}: {str(e)}")
@@ -94,6 +113,42 @@ class SQLAlchemyRepository(AbstractRepository):
         except DBAPIError as e:
             raise DBError(str(e))
 
+    async def get_page(
+            self,
+            limit: int,
+            before: int | None = None,
+            after: int | None = None,
+            descending: bool = True,
+            **filters
+    ) -> tuple[list, int | None]:
+        """Keyset-пагинация по id.
+
+        Без after возвращает самые новые строки (старше before, если он задан),
+        с after — строки сразу после него. descending задает только порядок
+        строк в ответе. Второй элемент — курсор следующей страницы в том же
+        направлении (передается в тот же параметр before/after) или None.
+        """
+        query = select(self.model).filter_by(**filters)
+        if before is not None:
+            query = query.where(self.model.id < before)
+        if after is not None:
+            query = query.where(self.model.id > after).order_by(self.model.id.asc())
+        else:
+            query = query.order_by(self.model.id.desc())
+        try:
+            # Лишняя строка показывает, есть ли следующая страница
+            result = await self.session.execute(query.limit(limit + 1))
+        except DBAPIError as e:
+            raise DBError(str(e))
+        rows = list(result.scalars().all())
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        next_cursor = rows[-1].id if has_more else None
+
+        if (after is None) != descending:
+            rows.reverse()
+        return rows, next_cursor
+
     async def edit_one(self, id: int, data: dict):
         if not data:
             logger.warning(
@@ -1,5 +1,42 @@
+from sqlalchemy import update, or_
 from app.repositories.base import SQLAlchemyRepository
 from app.models.chat import Chat
 
 class ChatRepository(SQLAlchemyRepository):
     model = Chat
+
+    async def update_summary(
+            self,
+            chat_id: int,
+            summary: str,
+            summary_message_id: int
+    ) -> bool:
+        # Не перезаписываем более свежую сводку, сохраненную параллельно
+        stmt = (
+            update(self.model)
+            .where(
+                self.model.id == chat_id,
+                or_(
+                    self.model.summary_message_id.is_(None),
+                    self.model.summary_message_id < summary_message_id,
+                ),
+            )
+            .values(summary=summary, summary_message_id=summary_message_id)
+        )
+        result = await self.session.execute(stmt)
+        return result.rowcount > 0
+
+    async def update_title(
+            self,
+            chat_id: int,
+            title: str,
+            provisional_title: str
+    ) -> bool:
+        # Меняем только временное название: переименованный за это время чат не трогаем
+        stmt = (
+            update(self.model)
+            .where(self.model.id == chat_id, self.model.title == provisional_title)
+            .values(title=title)
+        )
+        result = await self.session.execute(stmt)
+        return result.rowcount > 0
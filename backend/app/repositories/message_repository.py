@@ -1,4 +1,4 @@
-from sqlalchemy import select, desc, asc
+from sqlalchemy import select, desc, asc, func
 from app.repositories.base import SQLAlchemyRepository
 from app.models.chat import Message
 
@@ -6,12 +6,56 @@ from app.models.chat import Message
 class MessageRepository(SQLAlchemyRepository):
     model = Message
 
-    async def get_by_chat(self, chat_id: int, limit: int = 20) -> list[Message]:
+    async def get_by_chat(
+            self,
+            chat_id: int,
+            limit: int = 20,
+            before: int | None = None,
+            after: int | None = None
+    ) -> tuple[list[Message], int | None]:
+        """Страница сообщений чата в хронологическом порядке; по умолчанию — последние."""
+        return await self.get_page(
+            limit, before=before, after=after, descending=False, chat_id=chat_id)
+
+    async def get_recent(
+            self,
+            chat_id: int,
+            limit: int,
+            after_id: int | None = None
+    ) -> list[Message]:
+        """Последние limit сообщений чата (новее after_id) в хронологическом порядке."""
         stmt = (
             select(self.model)
             .filter(self.model.chat_id == chat_id)
+            .order_by(desc(self.model.id))
+            .limit(limit)
+        )
+        if after_id is not None:
+            stmt = stmt.filter(self.model.id > after_id)
+        result = await self.session.execute(stmt)
+        return list(reversed(result.scalars().all()))
+
+    async def get_after(
+            self,
+            chat_id: int,
+            after_id: int | None,
+            limit: int
+    ) -> list[Message]:
+        """Самые старые limit сообщений чата, идущие после after_id."""
+        stmt = (
+            select(self.model)
+            .filter(self.model.chat_id == chat_id, self.model.id > (after_id or 0))
             .order_by(asc(self.model.id))
             .limit(limit)
         )
         result = await self.session.execute(stmt)
         return result.scalars().all()
+
+    async def count_after(self, chat_id: int, after_id: int | None) -> int:
+        stmt = (
+            select(func.count())
+            .select_from(self.model)
+            .filter(self.model.chat_id == chat_id, self.model.id > (after_id or 0))
+        )
+        result = await self.session.execute(stmt)
+        return result.scalar_one()
@@ -3,6 +3,7 @@ from sqlalchemy.exc import IntegrityError
 from app.repositories.base import SQLAlchemyRepository
 from app.models.user import User
 from app.core.security.pwdcrypt import password_hasher
+from app.core.security.principal_cache import mark_principal_changed
 from app.schemas.user import UserCreate
 
 
@@ -17,6 +18,31 @@ class UserRepository(SQLAlchemyRepository):
         result = await self.session.execute(stmt)
         return result.scalars().first()
 
+    async def edit_one(self, id: int, data: dict) -> User | None:
+        # Через ORM, а не UPDATE ... RETURNING: нужен и старый email, чтобы
+        # сбросить кешированного пользователя, если email меняется
+        user = await self.get_one(id)
+        if user is None or not data:
+            return user
+        mark_principal_changed(self.session, user.email)
+        for key, value in data.items():
+            setattr(user, key, value)
+        await self.session.flush()
+        mark_principal_changed(self.session, user.email)
+        return user
+
+    async def set_active(self, id: int, is_active: bool) -> User | None:
+        return await self.edit_one(id, {"is_active": is_active})
+
+    async def delete_one(self, id: int) -> bool:
+        user = await self.get_one(id)
+        if user is None:
+            return False
+        mark_principal_changed(self.session, user.email)
+        await self.session.delete(user)
+        await self.session.flush()
+        return True
+
     async def create(self, user_data: UserCreate, hashed_password: str) -> User:
 
         user = User(
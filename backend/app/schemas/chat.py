@@ -30,3 +30,17 @@ class MessageOut(MessageSchema):
     model_config = ConfigDict(
         from_attributes=True
     )
+
+
+class JobOut(BaseModel):
+    id: str
+    status: str
+    chat_id: int
+    result: MessageOut | None = None
+    # HTTP-код и текст ошибки, если генерация не удалась
+    status_code: int | None = None
+    error: str | None = None
+
+    model_config = ConfigDict(
+        from_attributes=True
+    )
@@ -1,13 +1,23 @@
+import asyncio
+from contextlib import aclosing
+from typing import AsyncIterator
+
 from fastapi import HTTPException
 
 from app.models.chat import Chat
 from app.schemas.chat import ChatOut, MessageSchema, MessageOut, ChatCreate
 from app.utils.unit_of_work import IUnitOfWork
-from app.core.my_logging import logger
+from app.core.my_logging import get_logger
 from app.schemas.user import UserOut
-from app.services.openai import generate_chatgpt_response
+from app.core.config.settings import settings
+from app.services.context_builder import build_context
+from app.services.generation_jobs import GenerationJob, JobSlot, generation_jobs
+from app.services.openai import generate_chatgpt_response, generate_chatgpt_stream
+from app.utils.deadline import Deadline
 from app.utils.text import get_title
-from app.core.exceptions.exceptions import NoRowsFoundError
+from app.utils.sse import format_sse
+
+logger = get_logger("chat")
 
 
 class ChatService:
@@ -25,17 +35,23 @@ class ChatService:
             logger.info(f"Chat {chat.id} created by user {data.owner_id}")
             return chat_to_return
 
-    async def get_chats_by_user(self, owner_id: int) -> list[ChatOut]:
+    async def get_chats_by_user(
+            self,
+            owner_id: int,
+            limit: int = 100,
+            before: int | None = None,
+            after: int | None = None
+    ) -> tuple[list[ChatOut], int | None]:
+        """Страница чатов пользователя, новые первыми, и курсор следующей страницы."""
         async with self.uow:
             try:
-                chats = await self.uow.chat.get_all(owner_id=owner_id)
-            except NoRowsFoundError:
-                return []
+                chats, next_cursor = await self.uow.chat.get_page(
+                    limit, before=before, after=after, owner_id=owner_id)
             except Exception as e:
                 raise HTTPException(status_code=500, detail=str(e))
             logger.info(
                 f"User {owner_id} fetched their chat list ({len(chats)} chats)")
-            return [ChatOut.model_validate(chat) for chat in chats]
+            return [ChatOut.model_validate(chat) for chat in chats], next_cursor
 
     async def create_message(
             self,
@@ -60,104 +76,267 @@ class ChatService:
     async def create_chat_and_send_message(
         self,
         message_data: MessageSchema,
-        current_user: UserOut
+        current_user: UserOut,
+        use_cache: bool = True,
+        deadline: Deadline | None = None
     ) -> MessageOut:
+        # Чат с сообщением пользователя появляется в списке сразу, не дожидаясь ответа
+        chat_id, provisional_title = await self._start_chat(message_data, current_user)
+
         # Получаем ответ от нейросети по содержимому сообщения пользователя
-        gpt_response = await generate_chatgpt_response(message=message_data.content)
-        # Генерируем название чата на основе ответа нейросети
-        title = get_title(gpt_response)
+        gpt_response = await generate_chatgpt_response(
+            message=message_data.content, use_cache=use_cache,
+            user_id=current_user.id, deadline=deadline)
 
+        bot_message = await self._save_bot_reply(chat_id, gpt_response, provisional_title)
+        logger.info(
+            f"Chat {chat_id} created with user message and bot response for user {current_user.id}"
+        )
+        return bot_message
+
+    async def _start_chat(
+        self,
+        message_data: MessageSchema,
+        current_user: UserOut
+    ) -> tuple[int, str]:
+        """Создает чат с сообщением пользователя. Название временное — из вопроса."""
+        title = get_title(message_data.content)
         async with self.uow:
-            # Создаем новый чат. В ChatCreate owner_id берется из токена (current_user)
+            # В ChatCreate owner_id берется из токена (current_user)
             chat_create = ChatCreate(title=title, owner_id=current_user.id)
             chat: Chat = await self.uow.chat.add_one(chat_create.model_dump())
-
-            # Сохраняем сообщение пользователя в созданном чате
-            user_message_data = {
+            await self.uow.message.add_one({
                 "chat_id": chat.id,
                 "content": message_data.content,
                 "sender_id": current_user.id,
                 "role": "user"
-            }
-            await self.uow.message.add_one(user_message_data)
+            })
+            await self.uow.commit()
+            return chat.id, title
 
-            # Сохраняем сообщение от нейросети (бота). Здесь sender_id и role задаются явно.
-            bot_message_data = {
-                "chat_id": chat.id,
+    async def _save_bot_reply(
+        self,
+        chat_id: int,
+        gpt_response: str,
+        provisional_title: str | None = None
+    ) -> MessageOut:
+        async with self.uow:
+            bot_message = await self.uow.message.add_one({
+                "chat_id": chat_id,
                 "content": gpt_response,
                 "sender_id": 1,         # Фиксированный ID для бота
                 "role": "assistant"
-            }
-            bot_message = await self.uow.message.add_one(bot_message_data)
-
-            # Фиксируем изменения транзакции
+            })
+            if provisional_title is not None:
+                # Итоговое название по ответу нейросети — в той же транзакции
+                await self.uow.chat.update_title(
+                    chat_id, get_title(gpt_response), provisional_title)
+            bot_message_out = MessageOut.model_validate(bot_message)
             await self.uow.commit()
-            logger.info(
-                f"Chat {chat.id} created with user message and bot response for user {current_user.id}"
-            )
-        # Преобразуем ORM-объект в Pydantic-схему для ответа
-        return MessageOut.model_validate(bot_message)
+        return bot_message_out
 
     async def send_message_to_chat(
         self,
         chat_id: int,
         message_data: MessageSchema,
-        current_user: UserOut
+        current_user: UserOut,
+        use_cache: bool = True,
+        deadline: Deadline | None = None
     ) -> MessageOut:
         async with self.uow:
-            # Проверяем, существует ли чат
+            # Проверяем, существует ли чат и принадлежит ли он пользователю
+            chat: Chat = await self.uow.chat.get_one(chat_id)
+            if not chat or chat.owner_id != current_user.id:
+                raise HTTPException(status_code=404, detail="Чат не найден")
+
+            # Сводка заменяет старую часть истории; из более новых сообщений
+            # оставляем те, что влезают в бюджет токенов
+            chat_messages = await self.uow.message.get_recent(
+                chat_id, settings.LLM_CONTEXT_MAX_MESSAGES,
+                after_id=chat.summary_message_id)
+            messages = build_context(
+                chat_messages, message_data.content, summary=chat.summary)
+
+        # Сессия закрыта и соединение вернулось в пул: одновременных генераций
+        # может быть больше, чем соединений с БД
+        gpt_response = await generate_chatgpt_response(
+            messages=messages, use_cache=use_cache, user_id=current_user.id,
+            deadline=deadline)
+
+        # Оба сообщения пишем одной короткой транзакцией
+        return await self._save_reply(
+            chat_id, message_data, current_user, gpt_response)
+
+    async def accept_first_message(
+        self,
+        message_data: MessageSchema,
+        current_user: UserOut,
+        use_cache: bool = True
+    ) -> GenerationJob:
+        """Создает чат с сообщением пользователя и ставит ответ в очередь генерации."""
+        with generation_jobs.reserve() as slot:
+            chat_id, provisional_title = await self._start_chat(message_data, current_user)
+            messages = build_context([], message_data.content)
+            return self._submit_reply(
+                chat_id, current_user, messages, use_cache, slot, provisional_title)
+
+    async def accept_message_to_chat(
+        self,
+        chat_id: int,
+        message_data: MessageSchema,
+        current_user: UserOut,
+        use_cache: bool = True
+    ) -> GenerationJob:
+        """Сохраняет сообщение пользователя и ставит ответ в очередь генерации."""
+        with generation_jobs.reserve() as slot:
+            async with self.uow:
+                chat: Chat = await self.uow.chat.get_one(chat_id)
+                if not chat or chat.owner_id != current_user.id:
+                    raise HTTPException(status_code=404, detail="Чат не найден")
+
+                # Контекст читаем до записи нового сообщения: build_context добавит его сам
+                chat_messages = await self.uow.message.get_recent(
+                    chat_id, settings.LLM_CONTEXT_MAX_MESSAGES,
+                    after_id=chat.summary_message_id)
+                messages = build_context(
+                    chat_messages, message_data.content, summary=chat.summary)
+
+                await self.uow.message.add_one({
+                    "chat_id": chat_id,
+                    "content": message_data.content,
+                    "sender_id": current_user.id,
+                    "role": "user"
+                })
+                await self.uow.commit()
+            return self._submit_reply(chat_id, current_user, messages, use_cache, slot)
+
+    def _submit_reply(
+        self,
+        chat_id: int,
+        current_user: UserOut,
+        messages: list[dict],
+        use_cache: bool,
+        slot: JobSlot,
+        provisional_title: str | None = None
+    ) -> GenerationJob:
+        # Свой UoW: UoW запроса после ответа 202 занимают фоновые задачи эндпоинта
+        worker = ChatService(type(self.uow)())
+        job = generation_jobs.submit(
+            current_user.id, chat_id,
+            lambda: worker._generate_reply(
+                chat_id, current_user.id, messages, use_cache, provisional_title),
+            slot=slot)
+        logger.info(f"Generation job {job.id} queued for chat {chat_id}")
+        return job
+
+    async def _generate_reply(
+        self,
+        chat_id: int,
+        user_id: int,
+        messages: list[dict],
+        use_cache: bool,
+        provisional_title: str | None = None
+    ) -> MessageOut:
+        gpt_response = await generate_chatgpt_response(
+            messages=messages, use_cache=use_cache, user_id=user_id)
+        return await self._save_bot_reply(chat_id, gpt_response, provisional_title)
+
+    async def stream_message_to_chat(
+        self,
+        chat_id: int,
+        message_data: MessageSchema,
+        current_user: UserOut,
+        deadline: Deadline | None = None
+    ) -> AsyncIterator[str]:
+        async with self.uow:
+            # Проверяем чат до начала стрима, чтобы вернуть обычный 404
             chat: Chat = await self.uow.chat.get_one(chat_id)
-            if not chat:
+            if not chat or chat.owner_id != current_user.id:
                 raise HTTPException(status_code=404, detail="Чат не найден")
 
-            # Получаем историю сообщений для формирования контекста (можно ограничить, если нужно)
-            chat_messages = await self.uow.message.get_by_chat(chat_id)
+            chat_messages = await self.uow.message.get_recent(
+                chat_id, settings.LLM_CONTEXT_MAX_MESSAGES,
+                after_id=chat.summary_message_id)
+            messages = build_context(
+                chat_messages, message_data.content, summary=chat.summary)
+
+        # Открытый предохранитель и исчерпанная квота — обычные 503 и 429:
+        # проверяем их до того, как ответ начнет стримиться с кодом 200
+        deltas = await generate_chatgpt_stream(
+            messages, user_id=current_user.id, deadline=deadline)
+        # Сессия уже закрыта: соединение с БД не держим, пока идут токены
+        return self._stream_reply(chat_id, message_data, current_user, deltas)
+
+    async def _stream_reply(
+        self,
+        chat_id: int,
+        message_data: MessageSchema,
+        current_user: UserOut,
+        deltas: AsyncIterator[str]
+    ) -> AsyncIterator[str]:
+        chunks: list[str] = []
+        try:
+            async with aclosing(deltas) as stream:
+                async for delta in stream:
+                    chunks.append(delta)
+                    yield format_sse({"delta": delta})
+        except HTTPException as e:
+            logger.error(f"Streaming failed for chat {chat_id}: {e.detail}")
+            yield format_sse(
+                {"status_code": e.status_code, "detail": e.detail}, event="error")
+            return
 
-            # Генерируем ответ от нейросети, передавая историю сообщений
-            gpt_response = await generate_chatgpt_response(
-                message_data.content,
-                chat_messages=chat_messages
-            )
+        # Сохранение не должно прерываться, если клиент отключился на последнем чанке
+        bot_message = await asyncio.shield(self._save_reply(
+            chat_id, message_data, current_user, "".join(chunks)))
+        yield format_sse(bot_message.model_dump(), event="done")
 
-            # Формируем данные для сообщения пользователя
+    async def _save_reply(
+        self,
+        chat_id: int,
+        message_data: MessageSchema,
+        current_user: UserOut,
+        gpt_response: str
+    ) -> MessageOut:
+        async with self.uow:
             user_message_data = {
                 "chat_id": chat_id,
                 "content": message_data.content,
                 "sender_id": current_user.id,
                 "role": "user"
             }
-            await self.uow.message.add_one(user_message_data)
-
-            # Формируем данные для сообщения бота
             bot_message_data = {
                 "chat_id": chat_id,
                 "content": gpt_response,
                 "sender_id": 1,         # Фиксированный ID для бота
                 "role": "assistant"
             }
-            bot_message = await self.uow.message.add_one(bot_message_data)
-
-            # Фиксируем транзакцию
+            _, bot_message = await self.uow.message.add_many(
+                [user_message_data, bot_message_data])
+            bot_message_out = MessageOut.model_validate(bot_message)
             await self.uow.commit()
-
-        return MessageOut.model_validate(bot_message)
+        return bot_message_out
 
     async def get_chat_messages(
             self,
             chat_id: int,
-            current_user: UserOut
-    ) -> list[MessageOut]:
+            current_user: UserOut,
+            limit: int = 50,
+            before: int | None = None,
+            after: int | None = None
+    ) -> tuple[list[MessageOut], int | None]:
         async with self.uow:
             # Проверяем, существует ли чат
             chat: Chat = await self.uow.chat.get_one(chat_id)
             if not chat or chat.owner_id != current_user.id:
                 raise HTTPException(status_code=404, detail="Чат не найден")
 
-            # Получаем список сообщений через репозиторий сообщений
-            messages = await self.uow.message.get_by_chat(chat_id)
+            # Получаем страницу сообщений через репозиторий сообщений
+            messages, next_cursor = await self.uow.message.get_by_chat(
+                chat_id, limit=limit, before=before, after=after)
 
             # Преобразуем ORM объекты в Pydantic схему
-            return [MessageOut.model_validate(message) for message in messages]
+            return [MessageOut.model_validate(message) for message in messages], next_cursor
 
     async def delete_chat(self, chat_id: int, current_user: UserOut) -> dict:
         async with self.uow:
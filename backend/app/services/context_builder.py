@@ -0,0 +1,42 @@
+from app.core.config.settings import settings
+from app.models.chat import Message
+from app.utils.tokens import estimate_message_tokens
+
+
+def token_budget(model: str) -> int:
+    return settings.LLM_MODEL_TOKEN_BUDGETS.get(
+        model, settings.LLM_CONTEXT_TOKEN_BUDGET)
+
+
+def build_context(
+        history: list[Message],
+        message: str,
+        model: str = settings.GPT_MODEL,
+        summary: str | None = None
+) -> list[dict]:
+    """Собирает промпт: сводку старой части чата, самые свежие сообщения
+    истории, которые помещаются в бюджет модели, и новое сообщение пользователя.
+
+    history ожидается в хронологическом порядке. Новое сообщение попадает в
+    контекст всегда, даже если само по себе превышает бюджет.
+    """
+    remaining = token_budget(model) - estimate_message_tokens(message)
+    prefix: list[dict] = []
+    if summary:
+        content = f"Краткое содержание предыдущей части разговора:\n{summary}"
+        prefix.append({"role": "system", "content": content})
+        remaining -= estimate_message_tokens(content)
+
+    selected: list[dict] = []
+    # Идем от новых к старым и останавливаемся на первом, что не влезает,
+    # чтобы в контексте не было разрывов
+    for turn in reversed(history):
+        cost = estimate_message_tokens(turn.content)
+        if cost > remaining:
+            break
+        remaining -= cost
+        selected.append({"role": turn.role, "content": turn.content})
+
+    selected.reverse()
+    selected.append({"role": "user", "content": message})
+    return prefix + selected
@@ -0,0 +1,166 @@
+import asyncio
+import time
+import uuid
+from typing import Awaitable, Callable
+
+from fastapi import HTTPException, status
+
+from app.core.config.settings import settings
+from app.core.metrics import GENERATION_JOBS, GENERATION_JOBS_ACTIVE
+from app.core.my_logging import get_logger
+from app.schemas.chat import MessageOut
+
+logger = get_logger("jobs")
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class GenerationJob:
+    """Фоновая генерация ответа: статус, результат или ошибка."""
+
+    def __init__(self, owner_id: int, chat_id: int):
+        self.id = uuid.uuid4().hex
+        self.owner_id = owner_id
+        self.chat_id = chat_id
+        self.status = PENDING
+        self.result: MessageOut | None = None
+        self.status_code: int | None = None
+        self.error: str | None = None
+        self.finished_at: float | None = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED)
+
+
+class JobSlot:
+    """Место в очереди, занятое до записи в БД. submit превращает его в задачу,
+    а незанятое задачей место освобождается при выходе из with."""
+
+    def __init__(self, jobs: "GenerationJobs"):
+        self._jobs = jobs
+        self.held = True
+
+    def release(self) -> None:
+        if self.held:
+            self.held = False
+            self._jobs._reserved -= 1
+
+    def __enter__(self) -> "JobSlot":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
+
+
+class GenerationJobs:
+    """Очередь фоновых генераций с ограниченным числом одновременных вызовов LLM.
+
+    Одновременно выполняется не больше workers задач, остальные ждут своей
+    очереди. Сверх max_pending незавершенных задач новые отклоняются с 503.
+    Завершенные задачи хранятся ttl секунд, чтобы клиент успел забрать результат.
+    Состояние живет в памяти процесса: за статусом нужно приходить в тот же воркер.
+    """
+
+    def __init__(
+            self,
+            workers: int = settings.GENERATION_WORKERS,
+            max_pending: int = settings.GENERATION_MAX_PENDING,
+            ttl: float = settings.GENERATION_JOB_TTL
+    ):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self._jobs: dict[str, GenerationJob] = {}
+        self._tasks: set[asyncio.Task] = set()
+        # Места, занятые запросами, которые еще пишут сообщение в БД
+        self._reserved = 0
+        self._semaphore: asyncio.Semaphore | None = None
+
+    @property
+    def active(self) -> int:
+        return len(self._tasks)
+
+    def reserve(self) -> JobSlot:
+        """Занимает место в очереди или отклоняет запрос с 503. Вызывается до
+        записи в БД, чтобы не сохранять сообщение, ответ на которое не будет
+        сгенерирован: место занимается синхронно, и параллельные запросы не
+        проскочат проверку, пока первый ждет БД."""
+        self._prune()
+        if len(self._tasks) + self._reserved >= self.max_pending:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many pending generations, try again later",
+                headers={"Retry-After": "1"},
+            )
+        self._reserved += 1
+        return JobSlot(self)
+
+    def submit(
+            self,
+            owner_id: int,
+            chat_id: int,
+            fn: Callable[[], Awaitable[MessageOut]],
+            slot: JobSlot | None = None
+    ) -> GenerationJob:
+        """slot — место, занятое заранее через reserve; без него занимается здесь."""
+        slot = slot or self.reserve()
+        if not slot.held:
+            raise RuntimeError("Job slot was already released")
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.workers)
+
+        job = GenerationJob(owner_id, chat_id)
+        self._jobs[job.id] = job
+        task = asyncio.create_task(self._run(job, fn))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        slot.release()
+        GENERATION_JOBS_ACTIVE.inc()
+        return job
+
+    def get(self, job_id: str) -> GenerationJob | None:
+        return self._jobs.get(job_id)
+
+    async def _run(self, job: GenerationJob, fn: Callable[[], Awaitable[MessageOut]]) -> None:
+        try:
+            async with self._semaphore:
+                job.status = RUNNING
+                job.result = await fn()
+                job.status = DONE
+        except HTTPException as e:
+            job.status, job.status_code, job.error = FAILED, e.status_code, str(e.detail)
+        except asyncio.CancelledError:
+            job.status, job.status_code, job.error = FAILED, 503, "Generation was cancelled"
+            raise
+        except Exception as e:
+            job.status, job.status_code, job.error = FAILED, 500, str(e)
+        finally:
+            job.finished_at = time.monotonic()
+            GENERATION_JOBS_ACTIVE.dec()
+            GENERATION_JOBS.labels(job.status).inc()
+            if job.status == FAILED:
+                logger.error(
+                    f"Generation job {job.id} for chat {job.chat_id} failed: {job.error}")
+
+    def _prune(self) -> None:
+        expired_before = time.monotonic() - self.ttl
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished and job.finished_at < expired_before
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    async def stop(self) -> None:
+        """Отменяет незавершенные задачи при остановке приложения."""
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+generation_jobs = GenerationJobs()
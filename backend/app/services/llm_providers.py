@@ -0,0 +1,602 @@
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable
+
+import httpx
+import openai
+
+from app.core.config.settings import settings
+from app.core.metrics import (
+    LLM_FAILOVERS,
+    LLM_HEDGE_WINS,
+    LLM_HEDGES,
+    LLM_LATENCY,
+    LLM_RETRIES,
+    LLM_RETRY_BUDGET_EXHAUSTED,
+    LLM_TOKENS,
+)
+from app.core.my_logging import get_logger
+from app.utils.circuit_breaker import OPEN, CircuitBreaker, CircuitOpenError, Permit
+from app.utils.deadline import Deadline
+from app.utils.retry import RetryBudget, backoff_delay
+
+logger = get_logger("llm")
+
+COMPLETE = "complete"
+STREAM = "stream"
+
+# Ошибки в самом запросе: другой провайдер ответит так же, переключаться незачем
+_NOT_FAILOVER = (openai.BadRequestError, openai.UnprocessableEntityError)
+
+
+def can_failover(e: Exception) -> bool:
+    return isinstance(e, openai.OpenAIError) and not isinstance(e, _NOT_FAILOVER)
+
+
+class LLMProvider:
+    """OpenAI-совместимый провайдер и его здоровье по наблюдаемым вызовам.
+
+    Задержка сглаживается EWMA отдельно для обычных вызовов (полное время)
+    и для потоков (время до первого фрагмента), доля ошибок — тоже EWMA;
+    по ним провайдеры ранжируются. Выключает провайдера предохранитель.
+    """
+
+    def __init__(
+            self,
+            name: str,
+            base_url: str | None = None,
+            api_key: str | None = None,
+            model: str | None = None,
+            client: openai.AsyncOpenAI | None = None
+    ):
+        self.name = name
+        self.base_url = base_url
+        self.api_key = api_key
+        # Имя модели у этого провайдера, если оно отличается от запрошенного
+        self.model = model
+        self._client = client
+        self.latency: dict[str, float | None] = {COMPLETE: None, STREAM: None}
+        # Последние замеры для перцентилей, по которым выбирается задержка хеджирования
+        self.samples: dict[str, deque[float]] = {
+            mode: deque(maxlen=settings.LLM_HEDGE_WINDOW) for mode in (COMPLETE, STREAM)}
+        self.last_used: float | None = None
+        self.error_rate = 0.0
+        self.breaker = CircuitBreaker(
+            f"llm:{name}",
+            window=settings.LLM_CIRCUIT_WINDOW,
+            min_calls=settings.LLM_CIRCUIT_MIN_CALLS,
+            error_rate=settings.LLM_CIRCUIT_ERROR_RATE,
+            slow_call=settings.LLM_CIRCUIT_SLOW_CALL,
+            slow_rate=settings.LLM_CIRCUIT_SLOW_RATE,
+            open_for=settings.LLM_CIRCUIT_OPEN_FOR,
+            half_open_calls=settings.LLM_CIRCUIT_HALF_OPEN_CALLS,
+        )
+
+    @property
+    def client(self) -> openai.AsyncOpenAI:
+        # Ленивое создание — для скриптов и тестов, которые не запускают lifespan
+        if self._client is None:
+            self._client = self._create_client()
+        return self._client
+
+    def _create_client(self) -> openai.AsyncOpenAI:
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.LLM_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.LLM_KEEPALIVE_EXPIRY,
+            ),
+        )
+        return openai.AsyncOpenAI(
+            api_key=self.api_key,
+            base_url=self.base_url,
+            http_client=http_client,
+            # Таймауты задаются на каждый вызов из дедлайна запроса, повторы
+            # делает роутер: встроенные повторы клиента не видят ни дедлайна,
+            # ни бюджета повторов и задерживают переключение на другого провайдера
+            timeout=settings.LLM_ATTEMPT_TIMEOUT,
+            max_retries=0,
+        )
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+    def model_for(self, model: str) -> str:
+        return self.model or model
+
+    @property
+    def healthy(self) -> bool:
+        return self.breaker.state != OPEN
+
+    def score(self, mode: str) -> float:
+        """Ожидаемое время на один успешный ответ: меньше — лучше.
+
+        Без замеров (или давно не использованный) провайдер оценивается
+        оптимистично в 0: он получит один запрос и дальше пойдет по замерам,
+        а однажды оказавшийся медленным со временем снова получит шанс.
+        """
+        if self.last_used is None or time.monotonic() - self.last_used > settings.LLM_PROVIDER_STALE_AFTER:
+            return 0.0
+        success_rate = max(1.0 - self.error_rate, 0.05)
+        latency = self.latency[mode]
+        if latency is None:
+            # Замеров в этом режиме нет — берем другой режим как приближение
+            latency = next((v for v in self.latency.values() if v is not None), 0.0)
+        penalty = settings.LLM_PROVIDER_FAILURE_PENALTY * self.error_rate
+        return (latency + penalty) / success_rate
+
+    def latency_percentile(self, mode: str, percentile: float) -> float | None:
+        """Перцентиль задержки по последним замерам; None, пока их мало."""
+        samples = self.samples[mode]
+        if len(samples) < settings.LLM_HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, math.ceil(len(ordered) * percentile / 100) - 1)]
+
+    def record_success(self, mode: str, latency: float, permit: Permit | None = None) -> None:
+        """Учитывает задержку в оценке провайдера; с permit — и в предохранителе."""
+        self.samples[mode].append(latency)
+        alpha = settings.LLM_PROVIDER_EWMA_ALPHA
+        previous = self.latency[mode]
+        self.latency[mode] = latency if previous is None else alpha * latency + (1 - alpha) * previous
+        self.last_used = time.monotonic()
+        self.error_rate *= 1 - alpha
+        if permit is not None:
+            self.breaker.record_success(permit, latency)
+
+    def record_failure(self, e: Exception, permit: Permit) -> None:
+        alpha = settings.LLM_PROVIDER_EWMA_ALPHA
+        self.error_rate = alpha + (1 - alpha) * self.error_rate
+        self.last_used = time.monotonic()
+        self.breaker.record_failure(permit)
+
+    def snapshot(self) -> dict:
+        return {
+            "name": self.name,
+            "circuit": self.breaker.snapshot(),
+            "latency": dict(self.latency),
+            "error_rate": round(self.error_rate, 4),
+        }
+
+
+@contextmanager
+def _observe(provider: LLMProvider, model: str, mode: str):
+    """Пишет длительность попытки в гистограмму с исходом вызова."""
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    except (asyncio.CancelledError, GeneratorExit):
+        outcome = "cancelled"
+        raise
+    finally:
+        LLM_LATENCY.labels(provider.name, model, mode, outcome).observe(
+            time.perf_counter() - started)
+
+
+def _observe_usage(provider: LLMProvider, model: str, usage) -> None:
+    if usage is not None:
+        LLM_TOKENS.labels(provider.name, model, "prompt").observe(usage.prompt_tokens)
+        LLM_TOKENS.labels(provider.name, model, "completion").observe(usage.completion_tokens)
+
+
+def attempt_timeout(deadline: Deadline) -> httpx.Timeout:
+    """Таймауты одной попытки из остатка дедлайна: попытка не дольше
+    LLM_ATTEMPT_TIMEOUT, чтобы после зависшей оставалось время на повтор,
+    а подключение — не дольше LLM_CONNECT_TIMEOUT."""
+    total = min(deadline.check(), settings.LLM_ATTEMPT_TIMEOUT)
+    return httpx.Timeout(total, connect=min(settings.LLM_CONNECT_TIMEOUT, total))
+
+
+class _StreamStart:
+    """Поток, из которого уже пришел первый фрагмент текста."""
+
+    def __init__(
+            self,
+            provider: LLMProvider,
+            permit: Permit,
+            model: str,
+            stream,
+            chunks,
+            first: str | None,
+            started: float,
+            first_latency: float
+    ):
+        self.provider = provider
+        # Исход попытки предохранитель получает один раз, когда поток закончен
+        self.permit = permit
+        self.model = model
+        self.stream = stream
+        self.chunks = chunks
+        self.first = first
+        self.started = started
+        self.first_latency = first_latency
+
+    async def close(self) -> None:
+        await self.stream.close()
+        # Поток закрыт без вердикта (например, проиграл дублю): освобождаем место
+        self.provider.breaker.release(self.permit)
+
+
+class ProviderRouter:
+    """Выбирает самого быстрого провайдера с замкнутым предохранителем, а при
+    ошибке, не зависящей от самого запроса, повторяет вызов: сначала у
+    следующих провайдеров, затем по кругу с экспоненциальной паузой. Повторы
+    ограничены числом попыток, дедлайном запроса и общим бюджетом повторов.
+    Если разомкнуты предохранители всех провайдеров, вызов сразу получает
+    CircuitOpenError.
+
+    С LLM_HEDGE_ENABLED попытка, не ответившая (или не приславшая первый
+    фрагмент) за перцентиль LLM_HEDGE_PERCENTILE обычной задержки провайдера,
+    дублируется на другом провайдере или на том же; берется первый ответ,
+    второй вызов отменяется. Дублей не больше LLM_HEDGE_MAX_RATE от запросов.
+    """
+
+    def __init__(self, providers: list[LLMProvider]):
+        if not providers:
+            raise ValueError("At least one LLM provider is required")
+        self.providers = providers
+        self.retry_budget = RetryBudget(
+            settings.LLM_RETRY_BUDGET_RATIO, settings.LLM_RETRY_BUDGET_MIN_PER_SECOND)
+        # Тот же механизм долей, что у повторов: каждый запрос дает
+        # LLM_HEDGE_MAX_RATE дубля, без пополнения по времени. Бюджет стартует
+        # пустым и не копит больше одного дубля, иначе после простоя (и сразу
+        # после старта) дубли шли бы пачкой сверх доли
+        self.hedge_budget = RetryBudget(settings.LLM_HEDGE_MAX_RATE, 0, cap=1, initial=0)
+
+    def ordered(self, mode: str = COMPLETE) -> list[LLMProvider]:
+        return sorted(
+            self.providers,
+            key=lambda p: (not p.healthy, p.score(mode)),
+        )
+
+    def ensure_available(self) -> None:
+        """CircuitOpenError, если предохранители всех провайдеров разомкнуты:
+        запрос сразу получает отказ, а не ждет таймаута."""
+        if not any(provider.healthy for provider in self.providers):
+            raise CircuitOpenError(
+                min(provider.breaker.retry_after() for provider in self.providers))
+
+    def _available(self, mode: str) -> list[LLMProvider]:
+        self.ensure_available()
+        return [provider for provider in self.ordered(mode) if provider.healthy]
+
+    def _acquire(
+            self,
+            providers: list[LLMProvider],
+            attempt: int
+    ) -> tuple[LLMProvider, Permit]:
+        # Полуоткрытый предохранитель пропускает ограниченное число пробных
+        # вызовов: если место занято, берем следующего провайдера
+        for k in range(len(providers)):
+            provider = providers[(attempt + k) % len(providers)]
+            permit = provider.breaker.try_acquire()
+            if permit is not None:
+                return provider, permit
+        raise CircuitOpenError(
+            min(provider.breaker.retry_after() for provider in providers))
+
+    def snapshot(self) -> list[dict]:
+        return [provider.snapshot() for provider in self.providers]
+
+    async def _before_retry(
+            self,
+            provider: LLMProvider,
+            providers: list[LLMProvider],
+            attempt: int,
+            e: Exception,
+            deadline: Deadline
+    ) -> None:
+        """Решает, будет ли попытка номер attempt, и выдерживает паузу перед ней.
+        Если повтора не будет, поднимает исходную ошибку."""
+        if attempt >= settings.LLM_MAX_ATTEMPTS:
+            raise e
+        if not self.retry_budget.try_withdraw():
+            LLM_RETRY_BUDGET_EXHAUSTED.inc()
+            logger.warning(f"LLM retry budget exhausted, giving up after: {e}")
+            raise e
+
+        if attempt < len(providers):
+            # Следующий провайдер еще не пробовали: переключаемся сразу
+            LLM_FAILOVERS.labels(provider.name, type(e).__name__).inc()
+            logger.warning(f"LLM provider {provider.name} failed, failing over: {e}")
+            return
+
+        delay = backoff_delay(
+            attempt - len(providers) + 1,
+            settings.LLM_RETRY_BACKOFF_BASE,
+            settings.LLM_RETRY_BACKOFF_MAX)
+        if delay >= deadline.remaining():
+            raise e
+        LLM_RETRIES.labels(provider.name, type(e).__name__).inc()
+        logger.warning(
+            f"LLM provider {provider.name} failed, retrying in {delay:.2f}s: {e}")
+        await asyncio.sleep(delay)
+
+    def _hedge_delay(self, provider: LLMProvider, mode: str) -> float | None:
+        if not settings.LLM_HEDGE_ENABLED:
+            return None
+        delay = provider.latency_percentile(mode, settings.LLM_HEDGE_PERCENTILE)
+        if delay is None:
+            return None
+        return max(delay, settings.LLM_HEDGE_MIN_DELAY)
+
+    def _acquire_hedge(
+            self,
+            providers: list[LLMProvider],
+            primary: LLMProvider
+    ) -> tuple[LLMProvider, Permit] | None:
+        # Дубль лучше отправить другому провайдеру: медленный ответ мог быть
+        # вызван самим провайдером
+        for provider in [p for p in providers if p is not primary] + [primary]:
+            permit = provider.breaker.try_acquire()
+            if permit is not None:
+                if self.hedge_budget.try_withdraw():
+                    return provider, permit
+                provider.breaker.release(permit)
+                return None
+        return None
+
+    async def _hedged(
+            self,
+            mode: str,
+            provider: LLMProvider,
+            permit: Permit,
+            providers: list[LLMProvider],
+            call: Callable[[LLMProvider, Permit, httpx.Timeout], Awaitable[Any]],
+            deadline: Deadline,
+            timeout: httpx.Timeout,
+            discard: Callable[[Any], Awaitable[None]] | None = None
+    ) -> Any:
+        """Выполняет call(provider, permit, timeout), при долгом ожидании дублируя его.
+
+        Каждый call сам отчитывается предохранителю своего провайдера. Ответ
+        проигравшего, успевшего завершиться, передается в discard.
+        """
+        primary = asyncio.ensure_future(call(provider, permit, timeout))
+        delay = self._hedge_delay(provider, mode)
+        if delay is None:
+            return await primary
+
+        tasks = [primary]
+        winner = None
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            # Дубль стартует позже основного вызова: его таймаут считаем от
+            # оставшегося дедлайна, а не берем таймаут основного
+            backup = None
+            if not done and not deadline.expired:
+                hedge_timeout = attempt_timeout(deadline)
+                backup = self._acquire_hedge(providers, provider)
+            if backup is not None:
+                LLM_HEDGES.labels(mode).inc()
+                tasks.append(asyncio.ensure_future(call(*backup, hedge_timeout)))
+
+            error = None
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        winner = winner or task
+                    elif not can_failover(task.exception()) or error is None or task is primary:
+                        # Ошибку в самом запросе и ошибку основного вызова
+                        # отдаем наверх в первую очередь
+                        if error is None or can_failover(error):
+                            error = task.exception()
+                if winner is not None:
+                    if len(tasks) > 1:
+                        LLM_HEDGE_WINS.labels(
+                            mode, "primary" if winner is primary else "hedge").inc()
+                    return winner.result()
+                if error is not None and not can_failover(error):
+                    raise error
+            raise error
+        finally:
+            for task in tasks:
+                if task is winner:
+                    continue
+                if not task.done():
+                    task.cancel()
+                if discard is not None:
+                    # Проигравший мог успеть получить ответ, в том числе уже после cancel
+                    task.add_done_callback(lambda t: _discard_result(t, discard))
+
+    async def _complete_once(
+            self,
+            provider: LLMProvider,
+            permit: Permit,
+            model: str,
+            messages: list[dict],
+            timeout: httpx.Timeout
+    ) -> str:
+        """Один вызов провайдера; исход сразу передается его предохранителю."""
+        provider_model = provider.model_for(model)
+        started = time.perf_counter()
+        try:
+            with _observe(provider, provider_model, COMPLETE):
+                response = await provider.client.chat.completions.create(
+                    model=provider_model,
+                    messages=messages,
+                    timeout=timeout
+                )
+        except asyncio.CancelledError:
+            provider.breaker.release(permit)
+            raise
+        except Exception as e:
+            if can_failover(e):
+                provider.record_failure(e, permit)
+            else:
+                provider.breaker.release(permit)
+            raise
+        provider.record_success(COMPLETE, time.perf_counter() - started, permit)
+        _observe_usage(provider, provider_model, getattr(response, "usage", None))
+        return response.choices[0].message.content
+
+    async def complete(
+            self,
+            messages: list[dict],
+            model: str,
+            deadline: Deadline | None = None
+    ) -> str:
+        deadline = deadline or Deadline.after(settings.LLM_REQUEST_DEADLINE)
+        self.retry_budget.deposit()
+        self.hedge_budget.deposit()
+        providers = self._available(COMPLETE)
+        attempt = 0
+        while True:
+            timeout = attempt_timeout(deadline)
+            provider, permit = self._acquire(providers, attempt)
+            attempt += 1
+            try:
+                return await self._hedged(
+                    COMPLETE, provider, permit, providers,
+                    lambda p, pp, t: self._complete_once(p, pp, model, messages, t),
+                    deadline, timeout)
+            except Exception as e:
+                if not can_failover(e):
+                    raise
+                await self._before_retry(provider, providers, attempt, e, deadline)
+
+    async def _open_stream(
+            self,
+            provider: LLMProvider,
+            permit: Permit,
+            model: str,
+            messages: list[dict],
+            timeout: httpx.Timeout
+    ) -> _StreamStart:
+        """Открывает поток и ждет первого фрагмента текста; время до него
+        идет в оценку провайдера. Если поток открыт, исход попытки
+        предохранителю сообщает stream по его окончании."""
+        provider_model = provider.model_for(model)
+        started = time.perf_counter()
+        stream = None
+        outcome = "error"
+        try:
+            stream = await provider.client.chat.completions.create(
+                model=provider_model,
+                messages=messages,
+                stream=True,
+                timeout=timeout
+            )
+            chunks = stream.__aiter__()
+            first = None
+            async for chunk in chunks:
+                # usage приходит в последнем фрагменте, если провайдер его шлет
+                _observe_usage(provider, provider_model, getattr(chunk, "usage", None))
+                if chunk.choices and chunk.choices[0].delta.content:
+                    first = chunk.choices[0].delta.content
+                    break
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            provider.breaker.release(permit)
+            raise
+        except Exception as e:
+            if can_failover(e):
+                provider.record_failure(e, permit)
+            else:
+                provider.breaker.release(permit)
+            raise
+        else:
+            outcome = None
+            first_latency = time.perf_counter() - started
+            provider.record_success(STREAM, first_latency)
+            return _StreamStart(
+                provider, permit, provider_model, stream, chunks, first, started, first_latency)
+        finally:
+            if outcome is not None:
+                # Неудачная попытка: закрываем апстрим, чтобы соединение
+                # вернулось в пул, и пишем ее длительность
+                if stream is not None:
+                    await stream.close()
+                LLM_LATENCY.labels(provider.name, provider_model, STREAM, outcome).observe(
+                    time.perf_counter() - started)
+
+    async def stream(
+            self,
+            messages: list[dict],
+            model: str,
+            deadline: Deadline | None = None
+    ) -> AsyncIterator[str]:
+        """Потоковый ответ. Повтор и дубль возможны только до первого
+        фрагмента: начатый ответ уже ушел клиенту. Дедлайн тоже действует до
+        первого фрагмента, дальше паузы между фрагментами ограничены таймаутом
+        чтения."""
+        deadline = deadline or Deadline.after(settings.LLM_REQUEST_DEADLINE)
+        self.retry_budget.deposit()
+        self.hedge_budget.deposit()
+        providers = self._available(STREAM)
+        attempt = 0
+        while True:
+            timeout = attempt_timeout(deadline)
+            provider, permit = self._acquire(providers, attempt)
+            attempt += 1
+            try:
+                start = await self._hedged(
+                    STREAM, provider, permit, providers,
+                    lambda p, pp, t: self._open_stream(p, pp, model, messages, t),
+                    deadline, timeout, discard=_StreamStart.close)
+                break
+            except Exception as e:
+                if not can_failover(e):
+                    raise
+                await self._before_retry(provider, providers, attempt, e, deadline)
+
+        outcome = "error"
+        try:
+            if start.first is not None:
+                yield start.first
+            async for chunk in start.chunks:
+                _observe_usage(start.provider, start.model, getattr(chunk, "usage", None))
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+            outcome = "ok"
+            start.provider.breaker.record_success(start.permit, start.first_latency)
+        except (asyncio.CancelledError, GeneratorExit):
+            outcome = "cancelled"
+            raise
+        except Exception as e:
+            if can_failover(e):
+                start.provider.record_failure(e, start.permit)
+            raise
+        finally:
+            # Закрываем апстрим и в том числе при отключении клиента,
+            # чтобы соединение вернулось в пул
+            await start.close()
+            LLM_LATENCY.labels(start.provider.name, start.model, STREAM, outcome).observe(
+                time.perf_counter() - start.started)
+
+    async def close(self) -> None:
+        for provider in self.providers:
+            await provider.close()
+
+
+def _discard_result(task: asyncio.Future, discard: Callable[[Any], Awaitable[None]]) -> None:
+    if not task.cancelled() and task.exception() is None:
+        asyncio.ensure_future(discard(task.result()))
+
+
+def build_providers() -> list[LLMProvider]:
+    if not settings.GPT_PROVIDERS:
+        return [LLMProvider(
+            name="default",
+            base_url=settings.GPT_URL,
+            api_key=settings.GPT_API_KEY,
+        )]
+    return [
+        LLMProvider(
+            name=config.get("name") or f"provider{i}",
+            base_url=config["base_url"],
+            api_key=config.get("api_key", settings.GPT_API_KEY),
+            model=config.get("model"),
+        )
+        for i, config in enumerate(settings.GPT_PROVIDERS)
+    ]
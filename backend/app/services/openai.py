@@ -1,48 +1,200 @@
+import asyncio
+import hashlib
+import json
+import math
+from contextlib import aclosing
+from typing import AsyncIterator
+
 import openai
 
 from fastapi.exceptions import HTTPException
 from app.models.chat import Message
 
 from app.core.config.settings import settings
+from app.services.context_builder import build_context
+from app.services.llm_providers import ProviderRouter, build_providers
+from app.utils.cache import AbstractCache, InMemoryCache
+from app.utils.circuit_breaker import CircuitOpenError
+from app.utils.deadline import Deadline, DeadlineExceeded
+from app.utils.rate_limit import RateLimiter
+from app.utils.singleflight import SingleFlight
+from app.utils.timing import timed
+from app.utils.tokens import estimate_message_tokens
+
 
+# Провайдеры создаются в lifespan приложения; у каждого свой пул keep-alive соединений
+router: ProviderRouter | None = None
 
-client = openai.OpenAI(
-    api_key=settings.GPT_API_KEY,
-    base_url=settings.GPT_URL,
+# Бэкенд можно подменить на общий (например, Redis) реализацией AbstractCache
+response_cache: AbstractCache = InMemoryCache(
+    maxsize=settings.LLM_CACHE_SIZE, ttl=settings.LLM_CACHE_TTL, name="llm_response")
+# Одинаковые запросы, пришедшие одновременно, делят один вызов провайдера
+inflight = SingleFlight()
+# Свои лимиты перед провайдером: один активный пользователь не выбирает
+# общую квоту, а короткие всплески ждут в очереди вместо 429 от провайдера
+rate_limiter = RateLimiter(
+    global_requests=settings.LLM_GLOBAL_REQUESTS_PER_MINUTE,
+    global_tokens=settings.LLM_GLOBAL_TOKENS_PER_MINUTE,
+    user_requests=settings.LLM_USER_REQUESTS_PER_MINUTE,
+    user_tokens=settings.LLM_USER_TOKENS_PER_MINUTE,
+    max_wait=settings.LLM_RATE_LIMIT_MAX_WAIT,
 )
 
 
+async def init_llm_client() -> None:
+    global router
+    if router is None:
+        router = ProviderRouter(build_providers())
+
+
+async def close_llm_client() -> None:
+    global router
+    if router is not None:
+        await router.close()
+        router = None
+
+
+def get_router() -> ProviderRouter:
+    # Ленивое создание — для скриптов и тестов, которые не запускают lifespan
+    global router
+    if router is None:
+        router = ProviderRouter(build_providers())
+    return router
+
+
+def cache_key(model: str, messages: list[dict]) -> str:
+    # Нормализуем регистр ролей и пробелы по краям текста. Пробелы и переводы
+    # строк внутри не трогаем: в коде и списках они меняют смысл запроса
+    normalized = [
+        [message["role"].strip().lower(), message["content"].strip()]
+        for message in messages
+    ]
+    raw = json.dumps([model, normalized], ensure_ascii=False, separators=(",", ":"))
+    return "llm:" + hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _to_http_exception(e: Exception) -> HTTPException:
+    if isinstance(e, HTTPException):
+        return e
+    if isinstance(e, CircuitOpenError):
+        return HTTPException(
+            status_code=503,
+            detail="The language model is temporarily unavailable, try again later",
+            headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))})
+    if isinstance(e, (DeadlineExceeded, TimeoutError, openai.APITimeoutError)):
+        return HTTPException(
+            status_code=504,
+            detail="The language model did not respond in time")
+    if isinstance(e, (openai.APIConnectionError, openai.InternalServerError)):
+        return HTTPException(
+            status_code=502,
+            detail=f"The language model provider is unavailable: {e}")
+    if isinstance(e, openai.RateLimitError):
+        retry_after = e.response.headers.get("retry-after")
+        return HTTPException(
+            429,
+            detail=f"OpenAI API rate limit exceeded: {e}",
+            headers={"Retry-After": retry_after} if retry_after else None,
+        )
+    return HTTPException(
+        status_code=500,
+        detail=f"Error while communicating with OpenAI: {e}")
+
+
 async def generate_chatgpt_response(
         message: str | None = None,
         chat_messages: list[Message] | None = None,
-        model: str = "qwen-plus"
+        model: str = settings.GPT_MODEL,
+        messages: list[dict] | None = None,
+        use_cache: bool = True,
+        user_id: int | None = None,
+        deadline: Deadline | None = None
 ) -> str:
+    deadline = deadline or Deadline.after(settings.LLM_REQUEST_DEADLINE)
     try:
-        if chat_messages is None:
-            messages = [
-                {"role": "user", "content": message}
-            ]
-        else:
-            # Формируем историю для OpenAI API
-            messages = [
-                {"role": message.role, "content": message.content}
-                for message in chat_messages
-            ]
-            messages.append({"role": "user", "content": message})
-
-        # Отправляем историю в OpenAI API
-        response = client.chat.completions.create(
-            model=model,
-            messages=messages
-        )
+        if messages is None:
+            # Формируем историю для OpenAI API в пределах бюджета модели
+            messages = build_context(chat_messages or [], message, model)
 
-        return response.choices[0].message.content
-    except openai.RateLimitError as e:
-        raise HTTPException(
-            429,
-            detail=f"OpenAI API rate limit exceeded: {e}",
-        )
+        # Фаза llm запроса API: сколько он ждал ответа, в том числе чужого
+        # вызова через inflight
+        with timed("llm"):
+            if not (use_cache and settings.LLM_CACHE_ENABLED):
+                return await _complete(model, messages, user_id=user_id, deadline=deadline)
+
+            key = cache_key(model, messages)
+            cached = await response_cache.get(key)
+            if cached is not None:
+                return cached
+            # Квоту расходует тот, чей запрос ушел к провайдеру; присоединившиеся
+            # к нему и попадания в кеш ее не тратят. Общий вызов идет по дедлайну
+            # первого запроса, а каждый ожидающий ждет не дольше своего
+            async with asyncio.timeout(deadline.remaining()):
+                return await inflight.do(key, lambda: _complete(
+                    model, messages, key, user_id=user_id, deadline=deadline))
+    except Exception as e:
+        raise _to_http_exception(e)
+
+
+async def _acquire_quota(
+        user_id: int | None,
+        messages: list[dict],
+        deadline: Deadline
+) -> None:
+    if not settings.LLM_RATE_LIMIT_ENABLED:
+        return
+    tokens = sum(estimate_message_tokens(message["content"]) for message in messages)
+    await rate_limiter.acquire(
+        user_id, tokens + settings.LLM_RATE_COMPLETION_TOKENS,
+        max_wait=deadline.remaining())
+
+
+async def _complete(
+        model: str,
+        messages: list[dict],
+        key: str | None = None,
+        user_id: int | None = None,
+        deadline: Deadline | None = None
+) -> str:
+    deadline = deadline or Deadline.after(settings.LLM_REQUEST_DEADLINE)
+    # Провайдеры недоступны — отказываем сразу, не расходуя квоту
+    get_router().ensure_available()
+    await _acquire_quota(user_id, messages, deadline)
+    # Отправляем историю самому быстрому здоровому провайдеру
+    content = await get_router().complete(messages, model, deadline)
+
+    if key is not None and content:
+        await response_cache.set(key, content)
+    return content
+
+
+async def generate_chatgpt_stream(
+        messages: list[dict],
+        model: str = settings.GPT_MODEL,
+        user_id: int | None = None,
+        deadline: Deadline | None = None
+) -> AsyncIterator[str]:
+    """Проверяет доступность провайдеров и квоту и возвращает поток фрагментов
+    ответа. Проверки идут до начала ответа клиенту: отказ становится обычным
+    HTTP-ответом (503, 429), а не событием error в уже открытом стриме."""
+    deadline = deadline or Deadline.after(settings.LLM_REQUEST_DEADLINE)
+    try:
+        get_router().ensure_available()
+        await _acquire_quota(user_id, messages, deadline)
+    except Exception as e:
+        raise _to_http_exception(e)
+    return _stream_deltas(messages, model, deadline)
+
+
+async def _stream_deltas(
+        messages: list[dict],
+        model: str,
+        deadline: Deadline
+) -> AsyncIterator[str]:
+    try:
+        # aclosing: при отключении клиента апстрим закрывается сразу, а не сборщиком мусора
+        async with aclosing(get_router().stream(messages, model, deadline)) as deltas:
+            async for delta in deltas:
+                yield delta
     except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Error while communicating with OpenAI: {e}")
+        raise _to_http_exception(e)
@@ -0,0 +1,90 @@
+from app.core.config.settings import settings
+from app.core.my_logging import get_logger
+from app.models.chat import Message
+from app.services.openai import generate_chatgpt_response
+from app.utils.tokens import estimate_message_tokens
+from app.utils.unit_of_work import IUnitOfWork
+
+logger = get_logger("summary")
+
+SUMMARY_INSTRUCTION = (
+    "Ты ведешь краткое содержание диалога пользователя с ассистентом. "
+    "Обнови его с учетом новых сообщений: сохрани факты, договоренности, "
+    "имена, числа и открытые вопросы, опусти приветствия и повторы. "
+    "Ответь только текстом краткого содержания."
+)
+
+
+def build_summary_prompt(summary: str | None, messages: list[Message]) -> list[dict]:
+    turns = "\n".join(f"{message.role}: {message.content}" for message in messages)
+    return [
+        {"role": "system", "content": SUMMARY_INSTRUCTION},
+        {"role": "user", "content": (
+            f"Текущее краткое содержание:\n{summary or '(пусто)'}\n\n"
+            f"Новые сообщения:\n{turns}"
+        )},
+    ]
+
+
+class SummaryService:
+    # Чаты, сводка которых уже обновляется в этом процессе
+    _in_progress: set[int] = set()
+
+    def __init__(self, uow: IUnitOfWork):
+        self.uow = uow
+
+    async def refresh_if_needed(self, chat_id: int) -> None:
+        """Фоновая задача: дожимает старые сообщения чата в сводку."""
+        if chat_id in self._in_progress:
+            return
+        self._in_progress.add(chat_id)
+        try:
+            await self._refresh(chat_id)
+        except Exception as e:
+            logger.error(f"Failed to refresh summary for chat {chat_id}: {e}")
+        finally:
+            self._in_progress.discard(chat_id)
+
+    async def _refresh(self, chat_id: int) -> None:
+        async with self.uow:
+            chat = await self.uow.chat.get_one(chat_id)
+            if not chat:
+                return
+            pending = await self.uow.message.count_after(
+                chat_id, chat.summary_message_id)
+            if pending < settings.SUMMARY_TRIGGER_MESSAGES:
+                return
+
+            # Сжимаем самые старые сообщения, последние оставляем в контексте как есть
+            candidates = await self.uow.message.get_after(
+                chat_id,
+                chat.summary_message_id,
+                min(pending - settings.SUMMARY_KEEP_RECENT,
+                    settings.LLM_CONTEXT_MAX_MESSAGES),
+            )
+            if not candidates:
+                return
+            batch = self._fit_budget(candidates)
+            prompt = build_summary_prompt(chat.summary, batch)
+            last_id = batch[-1].id
+
+        # Сессия закрыта: соединение с БД не держим на время вызова LLM
+        summary = await generate_chatgpt_response(messages=prompt)
+
+        async with self.uow:
+            updated = await self.uow.chat.update_summary(chat_id, summary, last_id)
+            await self.uow.commit()
+        if updated:
+            logger.info(f"Chat {chat_id} summary refreshed up to message {last_id}")
+
+    @staticmethod
+    def _fit_budget(messages: list[Message]) -> list[Message]:
+        # Остаток не влезших сообщений уйдет в следующее обновление
+        remaining = settings.LLM_CONTEXT_TOKEN_BUDGET
+        batch = []
+        for message in messages:
+            remaining -= estimate_message_tokens(message.content)
+            if batch and remaining < 0:
+                break
+            batch.append(message)
+        return batch
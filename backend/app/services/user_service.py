@@ -4,7 +4,7 @@ from fastapi.security import OAuth2PasswordRequestForm
 
 from app.core.exceptions.exceptions import UserAlreadyExists
 from app.schemas.user import UserCreate
-from app.core.security.pwdcrypt import password_hasher, verify_password
+from app.core.security.pwdcrypt import password_hasher, verify_and_update
 from app.utils.unit_of_work import IUnitOfWork
 from app.core.security.auth import create_access_token, create_refresh_token, refresh_jwt
 from app.core.my_logging import logger
@@ -23,8 +23,8 @@ class UserService:
                     f"Попытка регистрации уже существующего email: {user_data.email}")
                 raise HTTPException(
                     status_code=400, detail="Email already registered")
+            hashed_password = await password_hasher(user_data.password)
             try:
-                hashed_password = password_hasher(user_data.password)
                 new_user = await self.uow.user.create(user_data, hashed_password)
                 await self.uow.commit()
                 return new_user
@@ -43,13 +43,27 @@ class UserService:
         """Вход в систему и выдача токенов"""
         async with self.uow:
             user = await self.uow.user.get_by_email(form_data.username)
-            if not user or not await verify_password(form_data.password, user.hashed_password):
+            verified, new_hash = False, None
+            if user:
+                verified, new_hash = await verify_and_update(
+                    form_data.password, user.hashed_password)
+            if not verified:
                 logger.warning(f"Неверные учетные данные для: {form_data.username}")
                 raise HTTPException(
                     status_code=401, detail="Invalid credentials")
+            email = user.email
+
+            if new_hash:
+                # Сменилась стоимость bcrypt: сохраняем пересчитанный хеш,
+                # неудача здесь не должна мешать входу
+                try:
+                    user.hashed_password = new_hash
+                    await self.uow.commit()
+                except Exception as e:
+                    logger.error(f"Не удалось обновить хеш пароля: {e}")
 
-            access_token = await create_access_token({"sub": user.email})
-            refresh_token = await create_refresh_token(data={"sub": user.email})
+            access_token = await create_access_token({"sub": email})
+            refresh_token = await create_refresh_token(data={"sub": email})
 
             # ✅ Сохраняем refresh токен в HttpOnly Cookie
             response.set_cookie(
@@ -10,11 +10,13 @@ from app.core.config.settings import settings
 from app.core.security.auth import get_current_user
 from app.api.chat import get_chat_service
 from app.main import app
+from app.models import Chat, User
 from app.models.base import Base
 from app.schemas.user import UserOut
 from app.repositories.chat_repository import ChatRepository
 from app.repositories.message_repository import MessageRepository
 from app.repositories.user_repository import UserRepository
+from app.utils.unit_of_work import UnitOfWork
 
 
 test_engine = create_async_engine(settings.TEST_DATABASE_URL, echo=True)
@@ -107,16 +109,40 @@ def override_get_current_user():
     app.dependency_overrides.pop(get_current_user, None)
 
 
+# Файловая SQLite со схемой, пользователем 1 и его чатом 1. Параметры движка
+# (например, размер пула) передаются через indirect-параметризацию:
+# @pytest.mark.parametrize("session_maker", [{"pool_size": 2}], indirect=True)
+@pytest_asyncio.fixture
+async def session_maker(request, tmp_path):
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'test.db'}", **getattr(request, "param", {}))
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(User.__table__.insert(), [
+            {"id": 1, "email": "user@example.com", "hashed_password": "-"}])
+        await conn.execute(Chat.__table__.insert(), [
+            {"id": 1, "title": "chat", "owner_id": 1}])
+    yield sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    await engine.dispose()
+
+
+def uow_for(session_maker) -> UnitOfWork:
+    """Настоящий UnitOfWork поверх тестовой БД."""
+    uow = UnitOfWork()
+    uow.session_factory = session_maker
+    return uow
+
+
 # Фикстура для подмены зависимости ChatService
 @pytest.fixture
 def override_get_chat_service():
     async def fake_get_chat_service():
         class FakeChatService:
-            async def get_chats_by_user(self, user_id: int):
+            async def get_chats_by_user(self, user_id: int, **kwargs):
                 return [
                     {"id": 1, "title": "Test Chat", "owner_id": 1}
-                ]
-            async def create_chat_and_send_message(self, message_data: dict, user_id: int):
+                ], None
+            async def create_chat_and_send_message(self, message_data: dict, user_id: int, **kwargs):
                 return {"id": 1, "content": "Test message", "sender_id": 1, "chat_id": 1}
         return FakeChatService()
 
@@ -0,0 +1,66 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import openai as llm
+from app.services.llm_providers import LLMProvider, ProviderRouter
+from app.utils.cache import InMemoryCache
+
+
+class FakeCompletions:
+    def __init__(self):
+        self.calls = 0
+
+    async def create(self, model, messages, **kwargs):
+        self.calls += 1
+        content = f"ответ {self.calls}"
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    completions = FakeCompletions()
+    client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    monkeypatch.setattr(llm, "router", ProviderRouter([LLMProvider("fake", client=client)]))
+    monkeypatch.setattr(llm, "response_cache", InMemoryCache(maxsize=10, ttl=60))
+    return completions
+
+
+@pytest.mark.asyncio
+async def test_in_memory_cache_lru_and_ttl(monkeypatch):
+    cache = InMemoryCache(maxsize=2, ttl=10)
+    await cache.set("a", 1)
+    await cache.set("b", 2)
+    assert await cache.get("a") == 1   # "a" становится самым свежим
+    await cache.set("c", 3)            # вытесняется "b"
+    assert await cache.get("b") is None
+    assert await cache.get("c") == 3
+
+    now = 1000.0
+    monkeypatch.setattr("app.utils.cache.time.monotonic", lambda: now)
+    await cache.set("d", 4, ttl=5)
+    now = 1006.0
+    assert await cache.get("d") is None
+    assert cache.stats() == {"hits": 2, "misses": 2, "hit_ratio": 0.5}
+
+
+def test_cache_key_normalizes_whitespace_and_role():
+    key = llm.cache_key("m", [{"role": "user", "content": "\nНапиши письмо "}])
+    assert key == llm.cache_key("m", [{"role": "User", "content": "Напиши письмо"}])
+    assert key != llm.cache_key("other", [{"role": "user", "content": "Напиши письмо"}])
+    # Отступы внутри текста значимы: это разные программы
+    nested = "if x:\n    y()\n    z()"
+    after = "if x:\n    y()\nz()"
+    assert llm.cache_key("m", [{"role": "user", "content": nested}]) != \
+        llm.cache_key("m", [{"role": "user", "content": after}])
+
+
+@pytest.mark.asyncio
+async def test_generate_uses_cache_unless_opted_out(fake_llm):
+    first = await llm.generate_chatgpt_response(message="Привет")
+    assert await llm.generate_chatgpt_response(message="Привет") == first
+    assert fake_llm.calls == 1
+
+    await llm.generate_chatgpt_response(message="Привет", use_cache=False)
+    assert fake_llm.calls == 2
@@ -64,4 +64,25 @@ async def test_send_first_message(override_get_current_user, override_get_chat_s
 #         chat = ChatOut(**data[0])  # Если данные неверны, Pydantic вызовет ошибку валидации
 #         assert chat.id == created_chat.id
 #         assert chat.owner_id == 1
-#         assert chat.title == "Test Chat"
\ No newline at end of file
+#         assert chat.title == "Test Chat"
+
+@pytest.mark.asyncio
+async def test_server_timing_breaks_down_request(override_get_current_user, override_get_chat_service):
+    async with AsyncClient(
+        base_url="http://test",
+        transport=ASGITransport(app=app),
+    ) as client:
+        response = await client.get("/api/chats/")
+        phases = [entry.split(";")[0] for entry in response.headers["Server-Timing"].split(", ")]
+        assert phases == ["serialization", "total"]
+
+
+@pytest.mark.asyncio
+async def test_client_errors_report_handling_time():
+    async with AsyncClient(
+        base_url="http://test",
+        transport=ASGITransport(app=app),
+    ) as client:
+        response = await client.get("/api/chats/")
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+        assert "X-ErrorHandleTime" in response.headers
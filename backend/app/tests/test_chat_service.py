@@ -0,0 +1,103 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.schemas.chat import MessageSchema
+from app.schemas.user import UserOut
+from app.services import chat_service, openai
+from app.services.chat_service import ChatService
+from app.services.llm_providers import LLMProvider, ProviderRouter
+from app.tests.conftest import uow_for
+from app.utils.text import get_title
+
+POOL_SIZE = 2
+# Настоящий QueuePool из POOL_SIZE соединений без overflow
+SMALL_POOL = {"pool_size": POOL_SIZE, "max_overflow": 0, "pool_timeout": 1}
+pytestmark = pytest.mark.parametrize("session_maker", [SMALL_POOL], indirect=True)
+
+
+def service(session_maker) -> ChatService:
+    return ChatService(uow_for(session_maker))
+
+
+@pytest.mark.asyncio
+async def test_generations_are_not_bounded_by_pool_size(session_maker, monkeypatch):
+    generations = POOL_SIZE * 4
+    running = peak = 0
+    all_started = asyncio.Event()
+
+    async def slow_generate(messages, **kwargs):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        if peak == generations:
+            all_started.set()
+        # Пока соединение держится на время генерации, сюда одновременно
+        # попадут только POOL_SIZE вызовов, а остальные упадут по pool_timeout
+        await asyncio.wait_for(all_started.wait(), timeout=5)
+        running -= 1
+        return "ответ"
+
+    monkeypatch.setattr(chat_service, "generate_chatgpt_response", slow_generate)
+    user = UserOut(id=1, email="user@example.com")
+
+    # return_exceptions: дожидаемся всех вызовов, чтобы не оставить открытых соединений
+    replies = await asyncio.gather(*(
+        service(session_maker).send_message_to_chat(
+            1, MessageSchema(content=f"вопрос {i}"), user)
+        for i in range(generations)
+    ), return_exceptions=True)
+    assert peak == generations
+    assert [getattr(reply, "content", reply) for reply in replies] == ["ответ"] * generations
+
+
+@pytest.mark.asyncio
+async def test_first_message_shows_chat_before_reply(session_maker, monkeypatch):
+    user = UserOut(id=1, email="user@example.com")
+    titles_during_generation = []
+
+    async def generate(message, **kwargs):
+        # Во время генерации чат уже виден в списке с названием из вопроса
+        chats, _ = await service(session_maker).get_chats_by_user(1)
+        titles_during_generation.extend(chat.title for chat in chats)
+        return "Это ответ. Второе предложение. Третье."
+
+    monkeypatch.setattr(chat_service, "generate_chatgpt_response", generate)
+    reply = await service(session_maker).create_chat_and_send_message(
+        MessageSchema(content="Как дела?"), user)
+
+    assert titles_during_generation == [get_title("Как дела?"), "chat"]
+    chats, _ = await service(session_maker).get_chats_by_user(1)
+    assert chats[0].id == reply.chat_id
+    assert chats[0].title == get_title("Это ответ. Второе предложение. Третье.")
+
+
+@pytest.mark.asyncio
+async def test_stream_with_open_circuit_is_rejected_before_it_starts(session_maker, monkeypatch):
+    provider = LLMProvider("p", client=object())
+    provider.breaker._open()
+    monkeypatch.setattr(openai, "router", ProviderRouter([provider]))
+
+    # Отказ приходит до того, как отдан поток событий: API вернет 503, а не 200
+    with pytest.raises(HTTPException) as e:
+        await service(session_maker).stream_message_to_chat(
+            1, MessageSchema(content="вопрос"), UserOut(id=1, email="user@example.com"))
+    assert e.value.status_code == 503
+    assert int(e.value.headers["Retry-After"]) >= 1
+
+
+@pytest.mark.asyncio
+async def test_cannot_send_into_foreign_chat(session_maker, monkeypatch):
+    calls = []
+
+    async def generate(messages, **kwargs):
+        calls.append(messages)
+        return "ответ"
+
+    monkeypatch.setattr(chat_service, "generate_chatgpt_response", generate)
+    with pytest.raises(HTTPException) as e:
+        await service(session_maker).send_message_to_chat(
+            1, MessageSchema(content="вопрос"), UserOut(id=2, email="other@example.com"))
+    assert e.value.status_code == 404
+    assert calls == []
@@ -0,0 +1,113 @@
+import json
+
+import pytest
+from fastapi import HTTPException
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import select
+
+from app.main import app
+from app.models import Message
+from app.schemas.chat import MessageSchema
+from app.schemas.user import UserOut
+from app.services import chat_service
+from app.services.chat_service import ChatService
+from app.tests.conftest import uow_for
+from app.utils.unit_of_work import UnitOfWork
+
+
+@pytest.fixture
+def services(session_maker, override_get_current_user):
+    """Подменяет только UnitOfWork: сервисы собираются настоящими зависимостями."""
+    created = []
+
+    def test_uow():
+        uow = uow_for(session_maker)
+        created.append(uow)
+        return uow
+
+    app.dependency_overrides[UnitOfWork] = test_uow
+    yield created
+    app.dependency_overrides.pop(UnitOfWork, None)
+
+
+def fake_stream(monkeypatch, deltas: list[str], error: Exception | None = None) -> dict:
+    """Подменяет поток провайдера; state показывает, закрыт ли он."""
+    state = {"closed": False}
+
+    async def upstream():
+        try:
+            for delta in deltas:
+                yield delta
+            if error is not None:
+                raise error
+        finally:
+            state["closed"] = True
+
+    async def open_stream(messages, **kwargs):
+        return upstream()
+
+    monkeypatch.setattr(chat_service, "generate_chatgpt_stream", open_stream)
+    return state
+
+
+def parse_sse(body: str) -> list[tuple[str, dict]]:
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((fields.get("event", "message"), json.loads(fields["data"])))
+    return events
+
+
+async def saved_messages(session_maker) -> list[tuple[str, str]]:
+    async with session_maker() as session:
+        result = await session.execute(select(Message).order_by(Message.id))
+        return [(message.role, message.content) for message in result.scalars()]
+
+
+async def post_stream(content: str):
+    async with AsyncClient(base_url="http://test", transport=ASGITransport(app=app)) as client:
+        return await client.post("/api/chats/1/messages/stream", json={"content": content})
+
+
+@pytest.mark.asyncio
+async def test_stream_sends_deltas_then_saved_message(session_maker, services, monkeypatch):
+    state = fake_stream(monkeypatch, ["При", "вет"])
+    response = await post_stream("вопрос")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = parse_sse(response.text)
+    assert events[:2] == [("message", {"delta": "При"}), ("message", {"delta": "вет"})]
+    event, message = events[2]
+    assert event == "done"
+    assert (message["chat_id"], message["content"]) == (1, "Привет")
+    assert state["closed"]
+    assert await saved_messages(session_maker) == [("user", "вопрос"), ("assistant", "Привет")]
+    # Фоновое обновление сводки не делит UoW с сохранением ответа
+    assert len(services) == 2
+
+
+@pytest.mark.asyncio
+async def test_provider_error_becomes_error_event(session_maker, services, monkeypatch):
+    fake_stream(monkeypatch, ["нача"], error=HTTPException(502, detail="provider is down"))
+    response = await post_stream("вопрос")
+
+    assert response.status_code == 200
+    assert parse_sse(response.text) == [
+        ("message", {"delta": "нача"}),
+        ("error", {"status_code": 502, "detail": "provider is down"}),
+    ]
+    assert await saved_messages(session_maker) == []
+
+
+@pytest.mark.asyncio
+async def test_client_disconnect_saves_nothing_and_closes_upstream(session_maker, monkeypatch):
+    state = fake_stream(monkeypatch, ["раз", "два", "три"])
+    events = await ChatService(uow_for(session_maker)).stream_message_to_chat(
+        1, MessageSchema(content="вопрос"), UserOut(id=1, email="user@example.com"))
+
+    assert parse_sse(await anext(events)) == [("message", {"delta": "раз"})]
+    # Так StreamingResponse закрывает генератор при отключении клиента
+    await events.aclose()
+    assert state["closed"]
+    assert await saved_messages(session_maker) == []
@@ -0,0 +1,78 @@
+import pytest
+
+from app.utils.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("app.utils.circuit_breaker.time.monotonic", lambda: now[0])
+    return now
+
+
+def breaker() -> CircuitBreaker:
+    return CircuitBreaker(
+        "test", window=10, min_calls=4, error_rate=0.5,
+        slow_call=2.0, slow_rate=0.75, open_for=5)
+
+
+def succeed(circuit: CircuitBreaker, latency: float = 0.1) -> None:
+    circuit.record_success(circuit.try_acquire(), latency)
+
+
+def fail(circuit: CircuitBreaker) -> None:
+    circuit.record_failure(circuit.try_acquire())
+
+
+def test_opens_on_error_rate_and_recovers_through_half_open(clock):
+    circuit = breaker()
+    succeed(circuit)
+    fail(circuit)
+    succeed(circuit)
+    assert circuit.state == CLOSED    # в окне меньше min_calls вызовов
+    fail(circuit)
+    assert circuit.state == OPEN
+    assert circuit.try_acquire() is None
+
+    clock[0] += 5
+    assert circuit.state == HALF_OPEN
+    trial = circuit.try_acquire()
+    assert trial is not None
+    assert circuit.try_acquire() is None  # пробный вызов только один
+    circuit.record_failure(trial)
+    assert circuit.state == OPEN
+
+    clock[0] += 5
+    succeed(circuit)
+    assert circuit.state == CLOSED
+
+
+def test_opens_on_slow_calls_and_forgets_old_ones(clock):
+    circuit = breaker()
+    for _ in range(3):
+        succeed(circuit, 3.0)
+    clock[0] += 11                    # медленные вызовы ушли из окна
+    succeed(circuit, 3.0)
+    assert circuit.state == CLOSED
+    for _ in range(3):
+        succeed(circuit, 3.0)
+    assert circuit.state == OPEN
+
+
+def test_only_half_open_trials_decide_recovery(clock):
+    circuit = breaker()
+    # Вызовы, начатые до размыкания
+    stale = [circuit.try_acquire() for _ in range(3)]
+    for _ in range(4):
+        fail(circuit)
+    assert circuit.state == OPEN
+
+    clock[0] += 5
+    trial = circuit.try_acquire()
+    for permit in stale:
+        circuit.record_success(permit, 0.1)
+    assert circuit.state == HALF_OPEN
+    # Исход учитывается один раз: повторный отчет по тому же разрешению не считается
+    circuit.record_success(trial, 3.0)
+    circuit.record_success(trial, 0.1)
+    assert circuit.state == OPEN      # медленный пробный вызов не замыкает цепь
@@ -0,0 +1,43 @@
+from app.core.config.settings import settings
+from app.models.chat import Message
+from app.services.context_builder import build_context, token_budget
+from app.utils.tokens import estimate_message_tokens, estimate_tokens
+
+
+def make_history(count: int, content: str = "x" * 400) -> list[Message]:
+    return [
+        Message(id=i, role="user" if i % 2 else "assistant", content=f"{i} {content}")
+        for i in range(1, count + 1)
+    ]
+
+
+def test_estimate_tokens_counts_non_ascii_denser():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcd" * 10) == 10
+    assert estimate_tokens("абвг" * 10) == 20
+
+
+def test_build_context_keeps_most_recent_messages(monkeypatch):
+    history = make_history(50)
+    per_message = estimate_message_tokens(history[0].content)
+    monkeypatch.setattr(settings, "LLM_CONTEXT_TOKEN_BUDGET", per_message * 5 + 10)
+
+    messages = build_context(history, "новый вопрос", model="some-model")
+
+    # Последним всегда идет новое сообщение, перед ним — самые свежие из истории
+    assert messages[-1] == {"role": "user", "content": "новый вопрос"}
+    assert [m["content"] for m in messages[:-1]] == [
+        m.content for m in history[-5:]
+    ]
+
+
+def test_build_context_uses_per_model_budget(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_MODEL_TOKEN_BUDGETS", {"big-model": 10 ** 6})
+    monkeypatch.setattr(settings, "LLM_CONTEXT_TOKEN_BUDGET", 1)
+
+    assert token_budget("big-model") == 10 ** 6
+    assert len(build_context(make_history(50), "q", model="big-model")) == 51
+    # Новое сообщение попадает в контекст, даже если бюджет исчерпан
+    assert build_context(make_history(50), "q", model="small-model") == [
+        {"role": "user", "content": "q"}
+    ]
@@ -0,0 +1,121 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from httpx import ASGITransport, AsyncClient
+
+from app.api.chat import get_chat_service
+from app.main import app
+from app.schemas.chat import MessageOut
+from app.services.generation_jobs import DONE, FAILED, GenerationJobs, generation_jobs
+
+
+def reply(chat_id: int) -> MessageOut:
+    return MessageOut(id=1, chat_id=chat_id, sender_id=1, content="ответ")
+
+
+@pytest.mark.asyncio
+async def test_concurrent_generations_are_bounded_by_workers():
+    jobs = GenerationJobs(workers=2, max_pending=10, ttl=60)
+    running = peak = 0
+
+    async def generate():
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return reply(1)
+
+    submitted = [jobs.submit(1, 1, generate) for _ in range(6)]
+    await asyncio.gather(*list(jobs._tasks))
+    assert peak == 2
+    assert all(job.status == DONE and job.result.content == "ответ" for job in submitted)
+
+
+@pytest.mark.asyncio
+async def test_failed_generation_keeps_status_code():
+    jobs = GenerationJobs(workers=1, max_pending=10, ttl=60)
+
+    async def fail():
+        raise HTTPException(429, detail="rate limit")
+
+    job = jobs.submit(1, 1, fail)
+    await asyncio.gather(*list(jobs._tasks))
+    assert job.status == FAILED
+    assert (job.status_code, job.error) == (429, "rate limit")
+
+
+@pytest.mark.asyncio
+async def test_full_queue_rejects_with_503():
+    jobs = GenerationJobs(workers=1, max_pending=1, ttl=60)
+    release = asyncio.Event()
+
+    async def generate():
+        await release.wait()
+        return reply(1)
+
+    jobs.submit(1, 1, generate)
+    with pytest.raises(HTTPException) as e:
+        jobs.submit(1, 1, generate)
+    assert e.value.status_code == 503
+    release.set()
+    await asyncio.gather(*list(jobs._tasks))
+
+
+@pytest.mark.asyncio
+async def test_reserved_slot_holds_place_until_submit():
+    jobs = GenerationJobs(workers=1, max_pending=1, ttl=60)
+
+    async def generate():
+        return reply(1)
+
+    # Место занято до записи в БД: параллельный запрос отклоняется сразу
+    with jobs.reserve() as slot:
+        with pytest.raises(HTTPException) as e:
+            jobs.reserve()
+        assert e.value.status_code == 503
+        job = jobs.submit(1, 1, generate, slot=slot)
+    await asyncio.gather(*list(jobs._tasks))
+    assert job.status == DONE
+
+    # Запись в БД упала: место освобождается
+    with pytest.raises(RuntimeError):
+        with jobs.reserve():
+            raise RuntimeError("db is down")
+    jobs.reserve().release()
+
+
+@pytest.mark.asyncio
+async def test_background_message_returns_202_and_job_result(override_get_current_user):
+    class FakeChatService:
+        async def accept_first_message(self, message_data, current_user, **kwargs):
+            async def generate():
+                return reply(7)
+            return generation_jobs.submit(current_user.id, 7, generate)
+
+    async def fake_get_chat_service():
+        return FakeChatService()
+
+    app.dependency_overrides[get_chat_service] = fake_get_chat_service
+    try:
+        async with AsyncClient(
+            base_url="http://test",
+            transport=ASGITransport(app=app),
+        ) as client:
+            response = await client.post(
+                "/api/chats/messages", params={"background": "true"},
+                json={"content": "вопрос"})
+            assert response.status_code == 202, response.text
+            assert response.json()["chat_id"] == 7
+            location = response.headers["Location"]
+
+            await asyncio.gather(*list(generation_jobs._tasks))
+            job = (await client.get(location)).json()
+            assert job["status"] == "done"
+            assert job["result"]["content"] == "ответ"
+
+            response = await client.get("/api/chats/jobs/unknown")
+            assert response.status_code == 404
+    finally:
+        app.dependency_overrides.pop(get_chat_service, None)
@@ -0,0 +1,151 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+from app.services.llm_providers import COMPLETE, LLMProvider, ProviderRouter
+from app.utils.circuit_breaker import CircuitOpenError
+from app.utils.deadline import Deadline, DeadlineExceeded
+from app.utils.retry import RetryBudget
+
+
+def fake_provider(
+        name: str,
+        reply=None,
+        error: Exception | None = None,
+        failures: int | None = None,
+        delay: float = 0
+) -> LLMProvider:
+    """failures — сколько первых вызовов падают с error (None — все)."""
+    calls = []
+    timeouts = []
+
+    async def create(model, messages, **kwargs):
+        calls.append(model)
+        timeouts.append(kwargs.get("timeout"))
+        await asyncio.sleep(delay)
+        if error is not None and (failures is None or len(calls) <= failures):
+            raise error
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=reply))])
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    provider = LLMProvider(name, client=client)
+    provider.calls = calls
+    provider.timeouts = timeouts
+    return provider
+
+
+def connection_error() -> openai.APIConnectionError:
+    return openai.APIConnectionError(request=httpx.Request("POST", "http://llm"))
+
+
+@pytest.mark.asyncio
+async def test_fails_over_and_marks_provider_unhealthy(monkeypatch):
+    monkeypatch.setattr("app.services.llm_providers.settings.LLM_CIRCUIT_MIN_CALLS", 1)
+    broken = fake_provider("broken", error=connection_error())
+    backup = fake_provider("backup", reply="ответ")
+    router = ProviderRouter([broken, backup])
+
+    assert await router.complete([], "m") == "ответ"
+    assert not broken.healthy
+    # Нездоровый провайдер больше не стоит первым
+    assert [p.name for p in router.ordered()] == ["backup", "broken"]
+    assert await router.complete([], "m") == "ответ"
+    assert len(broken.calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_prefers_faster_provider_and_keeps_request_errors():
+    slow = fake_provider("slow", reply="a")
+    fast = fake_provider("fast", reply="b")
+    slow.record_success(COMPLETE, 2.0)
+    fast.record_success(COMPLETE, 0.2)
+    assert [p.name for p in ProviderRouter([slow, fast]).ordered()] == ["fast", "slow"]
+
+    bad_request = openai.BadRequestError(
+        "bad", response=httpx.Response(400, request=httpx.Request("POST", "http://llm")),
+        body=None)
+    strict = fake_provider("strict", error=bad_request)
+    backup = fake_provider("backup", reply="c")
+    router = ProviderRouter([strict, backup])
+    with pytest.raises(openai.BadRequestError):
+        await router.complete([], "m")
+    assert backup.calls == []
+
+
+@pytest.mark.asyncio
+async def test_retries_same_provider_with_backoff(monkeypatch):
+    monkeypatch.setattr("app.services.llm_providers.settings.LLM_RETRY_BACKOFF_BASE", 0.001)
+    flaky = fake_provider("flaky", reply="ответ", error=connection_error(), failures=2)
+    router = ProviderRouter([flaky])
+    assert await router.complete([], "m") == "ответ"
+    assert len(flaky.calls) == 3
+
+
+@pytest.mark.asyncio
+async def test_exhausted_retry_budget_fails_fast():
+    flaky = fake_provider("flaky", reply="ответ", error=connection_error(), failures=1)
+    router = ProviderRouter([flaky])
+    router.retry_budget = RetryBudget(ratio=0, min_per_second=0, cap=0)
+    with pytest.raises(openai.APIConnectionError):
+        await router.complete([], "m")
+    assert len(flaky.calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_expired_deadline_skips_upstream_call():
+    provider = fake_provider("p", reply="ответ")
+    with pytest.raises(DeadlineExceeded):
+        await ProviderRouter([provider]).complete([], "m", Deadline.after(0))
+    assert provider.calls == []
+
+
+@pytest.mark.asyncio
+async def test_open_circuit_fails_fast(monkeypatch):
+    monkeypatch.setattr("app.services.llm_providers.settings.LLM_CIRCUIT_MIN_CALLS", 1)
+    monkeypatch.setattr("app.services.llm_providers.settings.LLM_MAX_ATTEMPTS", 1)
+    broken = fake_provider("broken", error=connection_error())
+    router = ProviderRouter([broken])
+    with pytest.raises(openai.APIConnectionError):
+        await router.complete([], "m")
+
+    with pytest.raises(CircuitOpenError) as e:
+        await router.complete([], "m")
+    assert e.value.retry_after > 0
+    assert len(broken.calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_slow_call_is_hedged_to_another_provider(monkeypatch):
+    monkeypatch.setattr("app.services.llm_providers.settings.LLM_HEDGE_ENABLED", True)
+    monkeypatch.setattr("app.services.llm_providers.settings.LLM_HEDGE_MIN_SAMPLES", 5)
+    monkeypatch.setattr("app.services.llm_providers.settings.LLM_HEDGE_MIN_DELAY", 0.01)
+    stuck = fake_provider("stuck", reply="поздно", delay=5)
+    backup = fake_provider("backup", reply="ответ")
+    for _ in range(5):
+        stuck.record_success(COMPLETE, 0.02)
+    # Без замеров резервный провайдер оценивается в 0 и встал бы первым
+    backup.record_success(COMPLETE, 1.0)
+    router = ProviderRouter([stuck, backup])
+    # Бюджет дублей стартует пустым: сразу после старта доля тоже соблюдается
+    router.hedge_budget.deposit()
+    assert not router.hedge_budget.try_withdraw()
+
+    router.hedge_budget = RetryBudget(ratio=1, min_per_second=0, cap=1, initial=0)
+    started = asyncio.get_running_loop().time()
+    assert await router.complete([], "m", Deadline.after(1)) == "ответ"
+    assert asyncio.get_running_loop().time() - started < 1
+    assert len(stuck.calls) == len(backup.calls) == 1
+    # Таймаут дубля считается от остатка дедлайна на момент его запуска
+    assert backup.timeouts[0].read < stuck.timeouts[0].read <= 1
+
+    # Бюджет дублей исчерпан: ждем основной вызов
+    router.hedge_budget = RetryBudget(ratio=0, min_per_second=0, cap=0)
+    stuck_fast = fake_provider("stuck", reply="сам", delay=0.05)
+    stuck_fast.samples = stuck.samples
+    router.providers = [stuck_fast, backup]
+    assert await router.complete([], "m") == "сам"
+    assert len(backup.calls) == 1
@@ -0,0 +1,29 @@
+import json
+import logging
+
+from app.core.my_logging import JsonFormatter, SamplingFilter
+
+
+def make_record(name: str, level: int, **extra) -> logging.LogRecord:
+    record = logging.makeLogRecord(
+        {"name": name, "levelno": level, "levelname": logging.getLevelName(level),
+         "msg": "Chat %s created", "args": (7,)})
+    record.__dict__.update(extra)
+    return record
+
+
+def test_json_formatter_includes_extra_fields():
+    line = JsonFormatter().format(make_record("app.chat", logging.INFO, chat_id=7))
+    data = json.loads(line)
+    assert data["message"] == "Chat 7 created"
+    assert data["logger"] == "app.chat"
+    assert data["level"] == "INFO"
+    assert data["chat_id"] == 7
+
+
+def test_sampling_drops_only_low_levels_of_matching_loggers():
+    sampling = SamplingFilter({"app.access": 0.0, "app": 1.0})
+    assert not sampling.filter(make_record("app.access", logging.INFO))
+    assert sampling.filter(make_record("app.access", logging.WARNING))
+    assert sampling.filter(make_record("app.accessories", logging.INFO))
+    assert sampling.filter(make_record("app.chat", logging.INFO))
@@ -0,0 +1,25 @@
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from app.main import app
+from app.utils.cache import InMemoryCache
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_exposes_route_and_cache_series():
+    cache = InMemoryCache(maxsize=1, ttl=60, name="test_cache")
+    await cache.set("a", 1)
+    await cache.get("a")
+    await cache.get("b")
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        await ac.get("/")
+        response = await ac.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'http_requests_total{method="GET",route="/",status="200"}' in body
+    assert 'http_request_duration_seconds_bucket{le="0.005",method="GET",route="/"}' in body
+    assert 'cache_requests_total{cache="test_cache",result="hit"} 1.0' in body
+    assert 'cache_requests_total{cache="test_cache",result="miss"} 1.0' in body
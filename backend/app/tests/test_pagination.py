@@ -0,0 +1,83 @@
+import pytest
+import pytest_asyncio
+from httpx import ASGITransport, AsyncClient
+
+from app.api.chat import NEXT_CURSOR_HEADER, get_chat_service
+from app.main import app
+from app.models import Chat, Message
+from app.repositories.message_repository import MessageRepository
+from app.services.chat_service import ChatService
+from app.tests.conftest import uow_for
+
+# Сообщения 1..7 в чате 1 и одно чужое (id 8) в чате 2
+CHAT_MESSAGES = 7
+
+
+@pytest_asyncio.fixture(autouse=True)
+async def messages(session_maker):
+    async with session_maker() as session:
+        await session.execute(Chat.__table__.insert(), [
+            {"id": 2, "title": "other", "owner_id": 1}])
+        await session.execute(Message.__table__.insert(), [
+            {"id": i, "chat_id": 1, "sender_id": 1, "content": f"m{i}", "role": "user"}
+            for i in range(1, CHAT_MESSAGES + 1)
+        ] + [{"id": 8, "chat_id": 2, "sender_id": 1, "content": "m8", "role": "user"}])
+        await session.commit()
+
+
+async def page(session_maker, **kwargs) -> tuple[list[int], int | None]:
+    async with session_maker() as session:
+        messages, cursor = await MessageRepository(session).get_by_chat(1, **kwargs)
+    return [message.id for message in messages], cursor
+
+
+@pytest.mark.asyncio
+async def test_latest_page_and_paging_back(session_maker):
+    # По умолчанию — последние сообщения в хронологическом порядке
+    assert await page(session_maker, limit=3) == ([5, 6, 7], 5)
+    assert await page(session_maker, limit=3, before=5) == ([2, 3, 4], 2)
+    # Последняя страница: курсора нет
+    assert await page(session_maker, limit=3, before=2) == ([1], None)
+    assert await page(session_maker, limit=CHAT_MESSAGES) == (list(range(1, 8)), None)
+
+
+@pytest.mark.asyncio
+async def test_paging_forward_with_after(session_maker):
+    assert await page(session_maker, limit=3, after=1) == ([2, 3, 4], 4)
+    assert await page(session_maker, limit=3, after=4) == ([5, 6, 7], None)
+    assert await page(session_maker, limit=3, after=7) == ([], None)
+
+
+@pytest.mark.asyncio
+async def test_before_and_after_together_bound_a_range(session_maker):
+    # Оба курсора ограничивают диапазон, страница идет вперед от after
+    assert await page(session_maker, limit=2, after=2, before=6) == ([3, 4], 4)
+    assert await page(session_maker, limit=2, after=4, before=6) == ([5], None)
+
+
+@pytest.mark.asyncio
+async def test_api_sets_next_cursor_header(session_maker, override_get_current_user):
+    async def real_chat_service():
+        return ChatService(uow_for(session_maker))
+
+    app.dependency_overrides[get_chat_service] = real_chat_service
+    try:
+        async with AsyncClient(
+            base_url="http://test",
+            transport=ASGITransport(app=app),
+        ) as client:
+            response = await client.get("/api/chats/1/messages", params={"limit": 3})
+            assert response.status_code == 200, response.text
+            assert [m["id"] for m in response.json()] == [5, 6, 7]
+            assert response.headers[NEXT_CURSOR_HEADER] == "5"
+
+            response = await client.get(
+                "/api/chats/1/messages",
+                params={"limit": 3, "before": response.headers[NEXT_CURSOR_HEADER]})
+            assert [m["id"] for m in response.json()] == [2, 3, 4]
+
+            response = await client.get("/api/chats/1/messages", params={"before": 2})
+            assert [m["id"] for m in response.json()] == [1]
+            assert NEXT_CURSOR_HEADER not in response.headers
+    finally:
+        app.dependency_overrides.pop(get_chat_service, None)
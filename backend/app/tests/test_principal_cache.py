@@ -0,0 +1,90 @@
+import jwt
+import pytest
+import pytest_asyncio
+from fastapi import HTTPException
+
+from app.core.security import auth, principal_cache
+from app.tests.conftest import uow_for
+
+
+@pytest_asyncio.fixture(autouse=True)
+async def auth_session_maker(session_maker, monkeypatch):
+    monkeypatch.setattr(auth, "async_session_maker", session_maker)
+    await auth.principal_cache.clear()
+    yield
+    await auth.principal_cache.clear()
+
+
+def token(email: str) -> str:
+    return jwt.encode({"sub": email}, auth.SECRET_KEY, algorithm=auth.ALGORITHM)
+
+
+@pytest.mark.asyncio
+async def test_principal_is_loaded_once(session_maker, monkeypatch):
+    lookups = 0
+    get_user = auth.get_user
+
+    async def counting_get_user(email, session):
+        nonlocal lookups
+        lookups += 1
+        return await get_user(email=email, session=session)
+
+    monkeypatch.setattr(auth, "get_user", counting_get_user)
+    for _ in range(3):
+        user = await auth.get_current_user(token("user@example.com"))
+        assert user.id == 1
+    assert lookups == 1
+
+    with pytest.raises(HTTPException):
+        await auth.get_current_user(token("missing@example.com"))
+
+
+@pytest.mark.asyncio
+async def test_deactivation_invalidates_cached_principal(session_maker):
+    assert (await auth.get_current_user(token("user@example.com"))).is_active
+
+    uow = uow_for(session_maker)
+    async with uow:
+        await uow.user.set_active(1, False)
+        # До коммита в кеше остается прежний пользователь
+        assert (await auth.get_current_user(token("user@example.com"))).is_active
+        await uow.commit()
+
+    with pytest.raises(HTTPException) as exc:
+        await auth.get_current_user(token("user@example.com"))
+    assert exc.value.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_miss_does_not_cache_row_read_before_invalidation(session_maker, monkeypatch):
+    get_user = auth.get_user
+
+    async def racing_get_user(email, session):
+        # Строка прочитана, и тут же параллельный запрос деактивирует пользователя
+        user = await get_user(email=email, session=session)
+        uow = uow_for(session_maker)
+        async with uow:
+            await uow.user.set_active(1, False)
+            await uow.commit()
+        return user
+
+    monkeypatch.setattr(auth, "get_user", racing_get_user)
+    assert (await auth.get_current_user(token("user@example.com"))).is_active
+
+    monkeypatch.setattr(auth, "get_user", get_user)
+    with pytest.raises(HTTPException):
+        await auth.get_current_user(token("user@example.com"))
+
+
+@pytest.mark.asyncio
+async def test_invalidation_marks_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(principal_cache.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(principal_cache.settings, "PRINCIPAL_CACHE_TTL", 60)
+    monkeypatch.setattr(principal_cache, "_invalidated", {})
+
+    for i in range(3):
+        await principal_cache.invalidate_principal(f"user{i}@example.com")
+    now[0] += 61
+    await principal_cache.invalidate_principal("fresh@example.com")
+    assert list(principal_cache._invalidated) == [principal_cache.principal_key("fresh@example.com")]
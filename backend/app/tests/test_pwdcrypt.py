@@ -0,0 +1,39 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+from app.core.security import pwdcrypt
+
+
+@pytest.fixture
+def cheap_context(monkeypatch):
+    context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=4)
+    monkeypatch.setattr(pwdcrypt, "pwd_context", context)
+    return context
+
+
+@pytest.mark.asyncio
+async def test_hash_is_upgraded_when_rounds_change(cheap_context, monkeypatch):
+    hashed = await pwdcrypt.password_hasher("secret-password")
+    assert await pwdcrypt.verify_and_update("secret-password", hashed) == (True, None)
+    assert (await pwdcrypt.verify_and_update("wrong", hashed))[0] is False
+
+    monkeypatch.setattr(pwdcrypt, "pwd_context", CryptContext(
+        schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=5))
+    verified, new_hash = await pwdcrypt.verify_and_update("secret-password", hashed)
+    assert verified and new_hash.startswith("$2b$05$")
+
+
+@pytest.mark.asyncio
+async def test_admission_limit_rejects_excess_requests(cheap_context, monkeypatch):
+    monkeypatch.setattr(pwdcrypt.settings, "PASSWORD_HASH_MAX_PENDING", 2)
+    results = await asyncio.gather(
+        *(pwdcrypt.password_hasher("secret-password") for _ in range(4)),
+        return_exceptions=True)
+    rejected = [r for r in results if isinstance(r, HTTPException)]
+    assert len(rejected) == 2
+    assert rejected[0].status_code == 503
+    assert rejected[0].headers["Retry-After"] == "1"
+    assert pwdcrypt._pending == 0
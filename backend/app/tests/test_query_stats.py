@@ -0,0 +1,53 @@
+import logging
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.main import app
+from app.utils import query_stats
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+@pytest.mark.asyncio
+async def test_queries_are_counted_and_slow_ones_explained(monkeypatch):
+    engine = create_async_engine("sqlite+aiosqlite://")
+    query_stats.instrument_engine(engine.sync_engine)
+    handler = ListHandler()
+    query_stats.logger.addHandler(handler)
+    monkeypatch.setattr(query_stats.settings, "DB_SLOW_QUERY_MS", 0.0)
+    try:
+        stats = query_stats.start_query_stats()
+        async with engine.connect() as conn:
+            await conn.execute(text("CREATE TABLE t (id INTEGER PRIMARY KEY)"))
+            await conn.execute(text("SELECT id FROM t WHERE id = :id"), {"id": 1})
+            await conn.execute(text("SELECT id FROM t WHERE id = :q"), {"q": "секрет"})
+    finally:
+        query_stats.logger.removeHandler(handler)
+        await engine.dispose()
+
+    assert stats.count == 3
+    assert stats.total > 0
+    assert "секрет" not in " ".join(record.getMessage() for record in handler.records)
+    select_log = handler.records[-2].getMessage()
+    assert select_log.startswith("Slow query")
+    # Значения параметров в предупреждение не попадают, только их типы
+    assert "params: 1 [int]" in select_log
+    assert "plan:" in select_log and "SEARCH t" in select_log
+
+
+@pytest.mark.asyncio
+async def test_response_reports_db_usage():
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.get("/")
+    assert response.headers["X-DB-Queries"] == "0"
+    assert float(response.headers["X-DB-Time"]) == 0.0
@@ -0,0 +1,34 @@
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from app.utils.rate_limit import RateLimiter
+
+
+@pytest.mark.asyncio
+async def test_heavy_user_does_not_exhaust_other_users():
+    limiter = RateLimiter(global_requests=600, user_requests=2, max_wait=0)
+    await limiter.acquire(1, tokens=10)
+    await limiter.acquire(1, tokens=10)
+    with pytest.raises(HTTPException) as e:
+        await limiter.acquire(1, tokens=10)
+    assert e.value.status_code == 429
+    assert int(e.value.headers["Retry-After"]) >= 1
+
+    # У другого пользователя свое ведро
+    await limiter.acquire(2, tokens=10)
+
+
+@pytest.mark.asyncio
+async def test_short_wait_is_queued_instead_of_rejected():
+    # 600 токенов в минуту — 10 в секунду: второй запрос ждет ~0.1 с
+    limiter = RateLimiter(global_tokens=600, max_wait=1)
+    await limiter.acquire(None, tokens=600)
+    started = time.monotonic()
+    await limiter.acquire(None, tokens=1)
+    assert 0.05 < time.monotonic() - started < 0.5
+
+    # 100 токенов набираются 10 с — дольше max_wait
+    with pytest.raises(HTTPException):
+        await limiter.acquire(None, tokens=100)
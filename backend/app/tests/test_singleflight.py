@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+from app.utils.singleflight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "ответ"
+
+    results = await asyncio.gather(*(flight.do("k", work) for _ in range(20)))
+    assert results == ["ответ"] * 20
+    assert calls == 1
+    assert len(flight) == 0
+
+    # Завершенный вызов не кешируется: следующий запрос идет заново
+    await flight.do("k", work)
+    assert calls == 2
+
+
+@pytest.mark.asyncio
+async def test_error_is_propagated_to_every_waiter():
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    results = await asyncio.gather(
+        *(flight.do("k", fail) for _ in range(5)), return_exceptions=True)
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+@pytest.mark.asyncio
+async def test_cancelling_one_waiter_keeps_the_call_for_others():
+    flight = SingleFlight()
+    started = asyncio.Event()
+    release = asyncio.Event()
+
+    async def work():
+        started.set()
+        await release.wait()
+        return 42
+
+    first = asyncio.create_task(flight.do("k", work))
+    second = asyncio.create_task(flight.do("k", work))
+    await started.wait()
+
+    first.cancel()
+    await asyncio.sleep(0)
+    release.set()
+    assert await second == 42
+    assert first.cancelled()
+
+
+@pytest.mark.asyncio
+async def test_upstream_is_cancelled_when_nobody_waits():
+    flight = SingleFlight()
+    started = asyncio.Event()
+    upstream_cancelled = asyncio.Event()
+
+    async def work():
+        started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            upstream_cancelled.set()
+            raise
+
+    waiter = asyncio.create_task(flight.do("k", work))
+    await started.wait()
+    waiter.cancel()
+    await asyncio.wait_for(upstream_cancelled.wait(), timeout=1)
+    assert len(flight) == 0
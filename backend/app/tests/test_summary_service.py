@@ -0,0 +1,111 @@
+import pytest
+
+from app.models import Chat, Message
+from app.schemas.chat import MessageSchema
+from app.schemas.user import UserOut
+from app.services import chat_service, summary_service
+from app.services.chat_service import ChatService
+from app.services.summary_service import SummaryService
+from app.tests.conftest import uow_for
+from app.utils.tokens import estimate_message_tokens
+
+SETTINGS = "app.services.summary_service.settings"
+
+
+@pytest.fixture(autouse=True)
+def summary_thresholds(monkeypatch):
+    monkeypatch.setattr(f"{SETTINGS}.SUMMARY_TRIGGER_MESSAGES", 5)
+    monkeypatch.setattr(f"{SETTINGS}.SUMMARY_KEEP_RECENT", 2)
+
+
+async def add_messages(session_maker, count: int) -> None:
+    async with session_maker() as session:
+        session.add_all(
+            Message(chat_id=1, sender_id=1, content=f"сообщение {i}", role="user")
+            for i in range(1, count + 1))
+        await session.commit()
+
+
+async def load_chat(session_maker) -> Chat:
+    async with session_maker() as session:
+        return await session.get(Chat, 1)
+
+
+def fake_llm(monkeypatch, module, reply: str = "сводка") -> list[list[dict]]:
+    prompts = []
+
+    async def generate(messages, **kwargs):
+        prompts.append(messages)
+        return reply
+
+    monkeypatch.setattr(module, "generate_chatgpt_response", generate)
+    return prompts
+
+
+@pytest.mark.asyncio
+async def test_no_refresh_below_threshold(session_maker, monkeypatch):
+    prompts = fake_llm(monkeypatch, summary_service)
+    await add_messages(session_maker, 4)
+
+    await SummaryService(uow_for(session_maker)).refresh_if_needed(1)
+    assert prompts == []
+    chat = await load_chat(session_maker)
+    assert (chat.summary, chat.summary_message_id) == (None, None)
+
+
+@pytest.mark.asyncio
+async def test_refresh_compresses_old_messages_and_advances(session_maker, monkeypatch):
+    prompts = fake_llm(monkeypatch, summary_service)
+    await add_messages(session_maker, 7)
+
+    await SummaryService(uow_for(session_maker)).refresh_if_needed(1)
+    # Сжаты все, кроме SUMMARY_KEEP_RECENT последних
+    assert "сообщение 5" in prompts[0][-1]["content"]
+    assert "сообщение 6" not in prompts[0][-1]["content"]
+    chat = await load_chat(session_maker)
+    assert (chat.summary, chat.summary_message_id) == ("сводка", 5)
+
+
+@pytest.mark.asyncio
+async def test_refresh_fits_batch_into_token_budget(session_maker, monkeypatch):
+    fake_llm(monkeypatch, summary_service)
+    monkeypatch.setattr(
+        f"{SETTINGS}.LLM_CONTEXT_TOKEN_BUDGET", 3 * estimate_message_tokens("сообщение 1"))
+    await add_messages(session_maker, 7)
+
+    await SummaryService(uow_for(session_maker)).refresh_if_needed(1)
+    # Остаток уйдет в следующее обновление
+    assert (await load_chat(session_maker)).summary_message_id == 3
+
+
+@pytest.mark.asyncio
+async def test_stale_summary_does_not_overwrite_newer_one(session_maker, monkeypatch):
+    await add_messages(session_maker, 7)
+
+    async def generate(messages, **kwargs):
+        # Пока идет вызов LLM, параллельное обновление успело сохранить более свежую сводку
+        async with session_maker() as session:
+            chat = await session.get(Chat, 1)
+            chat.summary, chat.summary_message_id = "новее", 6
+            await session.commit()
+        return "устаревшая"
+
+    monkeypatch.setattr(summary_service, "generate_chatgpt_response", generate)
+    await SummaryService(uow_for(session_maker)).refresh_if_needed(1)
+    chat = await load_chat(session_maker)
+    assert (chat.summary, chat.summary_message_id) == ("новее", 6)
+
+
+@pytest.mark.asyncio
+async def test_send_message_reads_only_messages_after_summary(session_maker, monkeypatch):
+    fake_llm(monkeypatch, summary_service)
+    await add_messages(session_maker, 7)
+    await SummaryService(uow_for(session_maker)).refresh_if_needed(1)
+
+    prompts = fake_llm(monkeypatch, chat_service, reply="ответ")
+    await ChatService(uow_for(session_maker)).send_message_to_chat(
+        1, MessageSchema(content="вопрос"), UserOut(id=1, email="user@example.com"))
+
+    system, *turns = prompts[0]
+    assert system["role"] == "system" and "сводка" in system["content"]
+    assert [turn["content"] for turn in turns] == ["сообщение 6", "сообщение 7", "вопрос"]
@@ -0,0 +1,89 @@
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any
+
+from app.core.metrics import CACHE_REQUESTS
+
+
+class AbstractCache(ABC):
+    """Интерфейс кеша. Методы асинхронные, чтобы его мог реализовать и
+    внешний общий storage (Redis и т.п.), а не только память процесса."""
+
+    def __init__(self, name: str = "default"):
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+
+    @abstractmethod
+    async def get(self, key: str) -> Any | None:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def set(self, key: str, value: Any, ttl: float | None = None) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def clear(self) -> None:
+        raise NotImplementedError
+
+    def _record(self, hit: bool) -> None:
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        CACHE_REQUESTS.labels(self.name, "hit" if hit else "miss").inc()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
+
+
+class InMemoryCache(AbstractCache):
+    """LRU-кеш в памяти процесса с ограничением размера и TTL записей."""
+
+    def __init__(self, maxsize: int, ttl: float, name: str = "default"):
+        super().__init__(name)
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    async def get(self, key: str) -> Any | None:
+        item = self._data.get(key)
+        if item is None:
+            self._record(False)
+            return None
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self._record(False)
+            return None
+        self._data.move_to_end(key)
+        self._record(True)
+        return value
+
+    async def set(self, key: str, value: Any, ttl: float | None = None) -> None:
+        if self.maxsize <= 0:
+            return
+        self._data[key] = (time.monotonic() + (ttl or self.ttl), value)
+        self._data.move_to_end(key)
+        # Вытесняем давно не использованные записи
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    async def delete(self, key: str) -> None:
+        self._data.pop(key, None)
+
+    async def clear(self) -> None:
+        self._data.clear()
@@ -0,0 +1,180 @@
+import math
+import time
+from collections import deque
+
+from app.core.metrics import CIRCUIT_STATE
+from app.core.my_logging import get_logger
+
+logger = get_logger("circuit")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Значения гауги circuit_breaker_state
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """Вызов не выполнен: цепь разомкнута."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Circuit is open, retry in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class Permit:
+    """Разрешение на один вызов. Исход по нему учитывается не больше одного
+    раза и только в том состоянии цепи, в котором разрешение выдано."""
+
+    __slots__ = ("generation", "settled")
+
+    def __init__(self, generation: int):
+        self.generation = generation
+        self.settled = False
+
+
+class CircuitBreaker:
+    """Предохранитель для вызовов внешнего сервиса.
+
+    closed: вызовы идут, их исходы копятся в скользящем окне за window
+    секунд. Как только в окне набралось min_calls вызовов и доля ошибок
+    достигла error_rate или доля медленных (дольше slow_call секунд) —
+    slow_rate, цепь размыкается.
+    open: вызовы сразу отклоняются в течение open_for секунд.
+    half_open: пропускается не больше half_open_calls пробных вызовов; если
+    все они успешны и не медленные, цепь замыкается, первая же ошибка или
+    медленный ответ снова ее размыкает.
+
+    Каждая смена состояния начинает новое поколение. Вызов, начатый в
+    прошлом поколении (например, до размыкания), на состояние уже не влияет:
+    пробными считаются только вызовы, разрешенные в half_open.
+    """
+
+    def __init__(
+            self,
+            name: str,
+            window: float,
+            min_calls: int,
+            error_rate: float,
+            slow_call: float,
+            slow_rate: float,
+            open_for: float,
+            half_open_calls: int = 1
+    ):
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call = slow_call
+        self.slow_rate = slow_rate
+        self.open_for = open_for
+        self.half_open_calls = half_open_calls
+        # (время, ошибка, медленный) по каждому завершенному вызову
+        self._calls: deque[tuple[float, bool, bool]] = deque()
+        self._state = CLOSED
+        self._opened_until = 0.0
+        self._trials = 0
+        self._trial_successes = 0
+        self._generation = 0
+        CIRCUIT_STATE.labels(name).set(_STATE_VALUES[CLOSED])
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and time.monotonic() >= self._opened_until:
+            self._set_state(HALF_OPEN)
+        return self._state
+
+    def retry_after(self) -> float:
+        return max(0.0, self._opened_until - time.monotonic()) if self._state == OPEN else 0.0
+
+    def try_acquire(self) -> Permit | None:
+        """Разрешение на вызов или None, если вызывать сейчас нельзя.
+        Выданное разрешение обязано закончиться record_success,
+        record_failure или release."""
+        state = self.state
+        if state == HALF_OPEN:
+            if self._trials >= self.half_open_calls:
+                return None
+            self._trials += 1
+        elif state != CLOSED:
+            return None
+        return Permit(self._generation)
+
+    def _settle(self, permit: Permit) -> bool:
+        """Гасит разрешение; True, если его исход нужно учесть."""
+        if permit.settled:
+            return False
+        permit.settled = True
+        if permit.generation != self._generation:
+            return False
+        if self._state == HALF_OPEN:
+            self._trials = max(0, self._trials - 1)
+        return True
+
+    def record_success(self, permit: Permit, latency: float) -> None:
+        if not self._settle(permit):
+            return
+        slow = latency >= self.slow_call
+        if self._state == HALF_OPEN:
+            if slow:
+                logger.warning(f"Circuit {self.name} reopened: trial call was slow")
+                self._open()
+                return
+            self._trial_successes += 1
+            if self._trial_successes >= self.half_open_calls:
+                self._set_state(CLOSED)
+            return
+        self._add(failed=False, slow=slow)
+
+    def record_failure(self, permit: Permit) -> None:
+        if not self._settle(permit):
+            return
+        if self._state == HALF_OPEN:
+            logger.warning(f"Circuit {self.name} reopened: trial call failed")
+            self._open()
+            return
+        self._add(failed=True, slow=False)
+
+    def release(self, permit: Permit) -> None:
+        """Вызов завершился без вердикта о здоровье сервиса (отмена, ошибка в запросе)."""
+        self._settle(permit)
+
+    def _add(self, failed: bool, slow: bool) -> None:
+        now = time.monotonic()
+        self._calls.append((now, failed, slow))
+        while self._calls and self._calls[0][0] < now - self.window:
+            self._calls.popleft()
+        if self._state != CLOSED or len(self._calls) < self.min_calls:
+            return
+        total = len(self._calls)
+        failures = sum(1 for _, f, _ in self._calls if f)
+        slow_calls = sum(1 for _, _, s in self._calls if s)
+        if failures / total >= self.error_rate or slow_calls / total >= self.slow_rate:
+            logger.warning(
+                f"Circuit {self.name} opened: {failures}/{total} failed, "
+                f"{slow_calls}/{total} slow in the last {self.window:.0f}s")
+            self._open()
+
+    def _open(self) -> None:
+        self._opened_until = time.monotonic() + self.open_for
+        self._set_state(OPEN)
+
+    def _set_state(self, state: str) -> None:
+        if state != OPEN:
+            logger.info(f"Circuit {self.name} is {state}")
+        self._state = state
+        self._generation += 1
+        self._trials = 0
+        self._trial_successes = 0
+        if state == CLOSED:
+            self._calls.clear()
+        CIRCUIT_STATE.labels(self.name).set(_STATE_VALUES[state])
+
+    def snapshot(self) -> dict:
+        return {
+            "state": self.state,
+            "retry_after": math.ceil(self.retry_after()),
+            "calls_in_window": len(self._calls),
+            "failures_in_window": sum(1 for _, f, _ in self._calls if f),
+        }
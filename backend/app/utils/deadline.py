@@ -0,0 +1,35 @@
+import time
+
+
+class DeadlineExceeded(TimeoutError):
+    """Время, отведенное запросу, истекло."""
+
+
+class Deadline:
+    """Момент, к которому запрос должен закончиться (по time.monotonic).
+
+    Создается в начале запроса и передается вниз по вызовам, чтобы каждый
+    шаг (ожидание лимита, попытка, пауза перед повтором) брал таймаут из
+    оставшегося времени, а не из своей константы.
+    """
+
+    def __init__(self, expires_at: float):
+        self.expires_at = expires_at
+
+    @classmethod
+    def after(cls, seconds: float) -> "Deadline":
+        return cls(time.monotonic() + seconds)
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def check(self) -> float:
+        """Оставшееся время; DeadlineExceeded, если его нет."""
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DeadlineExceeded("Request deadline exceeded")
+        return remaining
@@ -0,0 +1,105 @@
+import time
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config.settings import settings
+from app.core.my_logging import get_logger
+
+logger = get_logger("db")
+
+# План строим только для запросов, которые умеют объяснять обе СУБД
+_EXPLAINABLE = ("SELECT", "UPDATE", "DELETE", "WITH")
+_MAX_PARAMS_LENGTH = 500
+
+
+class QueryStats:
+    """Число запросов к БД и суммарное время на них в рамках одного запроса API."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+
+    @property
+    def total_ms(self) -> float:
+        return self.total * 1000
+
+
+_current: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+
+def start_query_stats() -> QueryStats:
+    """Начинает учет запросов для текущего запроса API и его дочерних задач."""
+    stats = QueryStats()
+    _current.set(stats)
+    return stats
+
+
+def current_query_stats() -> QueryStats | None:
+    return _current.get()
+
+
+def _explain(conn, statement: str, parameters) -> list[str]:
+    prefix = "EXPLAIN QUERY PLAN " if conn.dialect.name == "sqlite" else "EXPLAIN "
+    # Отдельный DBAPI-курсор: результат исходного запроса еще не прочитан,
+    # а через Connection запрос снова прошел бы через эти же события
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        return [" | ".join(str(col) for col in row) for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+
+def _describe_params(parameters) -> str:
+    """Число и типы параметров без значений."""
+    if isinstance(parameters, dict):
+        values = list(parameters.values())
+    elif isinstance(parameters, (list, tuple)):
+        values = list(parameters)
+    else:
+        return type(parameters).__name__
+    return f"{len(values)} [{', '.join(type(v).__name__ for v in values)}]"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Время старта храним в контексте выполнения: упавший запрос не оставит
+    # после себя мусора, как в общем для соединения conn.info
+    context._query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._query_start
+    stats = _current.get()
+    if stats is not None:
+        stats.count += 1
+        stats.total += elapsed
+
+    elapsed_ms = elapsed * 1000
+    if elapsed_ms < settings.DB_SLOW_QUERY_MS:
+        return
+    plan = None
+    if (settings.DB_SLOW_QUERY_EXPLAIN and not executemany
+            and statement.lstrip().upper().startswith(_EXPLAINABLE)):
+        try:
+            plan = _explain(conn, statement, parameters)
+        except Exception as e:
+            plan = [f"EXPLAIN failed: {e}"]
+    params = (f"{len(parameters)} rows" if executemany else _describe_params(parameters))
+    logger.warning(
+        f"Slow query ({elapsed_ms:.1f} ms): {statement} | params: {params}"
+        + (f" | plan: {'; '.join(plan)}" if plan else ""),
+        extra={"duration_ms": round(elapsed_ms, 2)},
+    )
+    if settings.DB_SLOW_QUERY_LOG_PARAMS:
+        logger.debug(
+            f"Slow query params: {repr(parameters)[:_MAX_PARAMS_LENGTH]}",
+            extra={"duration_ms": round(elapsed_ms, 2)},
+        )
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Вешает на движок учет запросов и лог медленных запросов."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
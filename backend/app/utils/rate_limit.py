@@ -0,0 +1,134 @@
+import asyncio
+import math
+import time
+
+from fastapi import HTTPException, status
+
+from app.core.metrics import RATE_LIMIT_REJECTED, RATE_LIMIT_WAIT
+
+
+class TokenBucket:
+    """Ведро токенов: rate в секунду, вмещает не больше capacity.
+
+    Токены резервируются сразу, даже в долг: следующий вызов видит долг и
+    ждет дольше, поэтому ожидающие обслуживаются в порядке прихода.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.level = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        self._refill(now)
+        return max(0.0, (amount - self.level) / self.rate)
+
+    def take(self, amount: float) -> None:
+        self.level -= amount
+
+    def refund(self, amount: float) -> None:
+        self.level = min(self.capacity, self.level + amount)
+
+    def idle(self, now: float) -> bool:
+        self._refill(now)
+        return self.level >= self.capacity
+
+
+def per_minute(limit: float) -> TokenBucket | None:
+    # 0 — без ограничения; за минуту можно израсходовать весь лимит сразу
+    return TokenBucket(limit / 60, limit) if limit > 0 else None
+
+
+class RateLimiter:
+    """Общие и пользовательские лимиты на запросы и токены в минуту.
+
+    Запрос ждет, пока во всех ведрах хватит запаса, но не дольше max_wait;
+    если ждать пришлось бы дольше, сразу получает 429 с Retry-After.
+    """
+
+    # Как часто выбрасывать ведра пользователей, которые давно не обращались
+    PRUNE_INTERVAL = 60.0
+
+    def __init__(
+            self,
+            global_requests: float = 0,
+            global_tokens: float = 0,
+            user_requests: float = 0,
+            user_tokens: float = 0,
+            max_wait: float = 0
+    ):
+        self.global_buckets = {
+            "requests": per_minute(global_requests),
+            "tokens": per_minute(global_tokens),
+        }
+        self.user_requests = user_requests
+        self.user_tokens = user_tokens
+        self.max_wait = max_wait
+        self._users: dict[int, dict[str, TokenBucket | None]] = {}
+        self._pruned = time.monotonic()
+
+    def _user_buckets(self, user_id: int, now: float) -> dict[str, TokenBucket | None]:
+        if now - self._pruned > self.PRUNE_INTERVAL:
+            self._pruned = now
+            for idle_user in [
+                uid for uid, buckets in self._users.items()
+                if all(b is None or b.idle(now) for b in buckets.values())
+            ]:
+                del self._users[idle_user]
+        buckets = self._users.get(user_id)
+        if buckets is None:
+            buckets = self._users[user_id] = {
+                "requests": per_minute(self.user_requests),
+                "tokens": per_minute(self.user_tokens),
+            }
+        return buckets
+
+    async def acquire(
+            self,
+            user_id: int | None,
+            tokens: int,
+            max_wait: float | None = None
+    ) -> None:
+        """max_wait — дополнительный предел ожидания, например остаток дедлайна."""
+        if max_wait is None or max_wait > self.max_wait:
+            max_wait = self.max_wait
+        now = time.monotonic()
+        scopes = {"global": self.global_buckets}
+        if user_id is not None:
+            scopes["user"] = self._user_buckets(user_id, now)
+
+        amounts = {"requests": 1, "tokens": tokens}
+        reserved = []
+        wait = 0.0
+        for scope, buckets in scopes.items():
+            for kind, bucket in buckets.items():
+                if bucket is None:
+                    continue
+                bucket_wait = bucket.wait_time(amounts[kind], now)
+                if bucket_wait > max_wait:
+                    RATE_LIMIT_REJECTED.labels(scope, kind).inc()
+                    raise HTTPException(
+                        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                        detail="Too many requests to the language model, try again later",
+                        headers={"Retry-After": str(math.ceil(bucket_wait))},
+                    )
+                wait = max(wait, bucket_wait)
+                reserved.append((bucket, amounts[kind]))
+
+        for bucket, amount in reserved:
+            bucket.take(amount)
+        if wait <= 0:
+            return
+        RATE_LIMIT_WAIT.observe(wait)
+        try:
+            await asyncio.sleep(wait)
+        except asyncio.CancelledError:
+            # Запрос отменен в очереди: его резерв достается следующим
+            for bucket, amount in reserved:
+                bucket.refund(amount)
+            raise
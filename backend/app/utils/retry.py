@@ -0,0 +1,51 @@
+import random
+import time
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Экспоненциальная пауза перед повтором с полным джиттером: случайная
+    величина от 0 до base * 2^(attempt-1), но не больше cap. Джиттер
+    разводит повторы клиентов, упавших одновременно."""
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+class RetryBudget:
+    """Общий на процесс бюджет повторов.
+
+    Каждый запрос пополняет бюджет на ratio повтора, каждый повтор тратит
+    один; кроме того, бюджет сам пополняется на min_per_second повторов в
+    секунду, чтобы при малом трафике повторы оставались возможны. Когда
+    провайдер лежит, бюджет быстро кончается, и повторы не умножают нагрузку
+    на него, а запросы сразу получают ошибку.
+    """
+
+    def __init__(
+            self,
+            ratio: float,
+            min_per_second: float,
+            cap: float | None = None,
+            initial: float | None = None
+    ):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        # Запас не копится бесконечно за время простоя
+        self.cap = cap if cap is not None else max(10.0, min_per_second * 10)
+        # По умолчанию бюджет стартует полным
+        self.balance = self.cap if initial is None else min(initial, self.cap)
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.balance = min(self.cap, self.balance + (now - self.updated) * self.min_per_second)
+        self.updated = now
+
+    def deposit(self) -> None:
+        self._refill()
+        self.balance = min(self.cap, self.balance + self.ratio)
+
+    def try_withdraw(self) -> bool:
+        self._refill()
+        if self.balance < 1:
+            return False
+        self.balance -= 1
+        return True
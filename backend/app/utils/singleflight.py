@@ -0,0 +1,45 @@
+import asyncio
+from typing import Any, Awaitable, Callable
+
+
+class _Call:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Склеивает одновременные вызовы с одинаковым ключом в один.
+
+    Первый вызов запускает задачу, остальные ждут ее результат; ошибку
+    задачи получают все ожидающие. Отмена одного ожидающего не затрагивает
+    остальных, а сама задача отменяется, только когда ее больше никто не ждет.
+    """
+
+    def __init__(self):
+        self._calls: dict[str, _Call] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(fn()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Ждать больше некому: отменяем апстрим и сразу освобождаем
+                # ключ, чтобы новый вызов не подцепился к отменяемой задаче
+                self._forget(key, call)
+                call.task.cancel()
+
+    def _forget(self, key: str, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
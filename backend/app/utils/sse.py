@@ -0,0 +1,9 @@
+import json
+
+
+def format_sse(data: dict, event: str | None = None) -> str:
+    """Кодирует одно событие Server-Sent Events."""
+    payload = json.dumps(data, ensure_ascii=False)
+    if event is None:
+        return f"data: {payload}\n\n"
+    return f"event: {event}\ndata: {payload}\n\n"
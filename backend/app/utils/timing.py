@@ -0,0 +1,42 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+class RequestTiming:
+    """Время, потраченное запросом API по фазам (auth, llm, serialization...)."""
+
+    def __init__(self):
+        self.phases: dict[str, float] = {}
+        # Момент, когда эндпоинт вернул результат; дальше идет сериализация
+        self.endpoint_done: float | None = None
+
+    def add(self, phase: str, seconds: float) -> None:
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+
+_current: ContextVar[RequestTiming | None] = ContextVar("request_timing", default=None)
+
+
+def start_request_timing() -> RequestTiming:
+    timing = RequestTiming()
+    _current.set(timing)
+    return timing
+
+
+def current_timing() -> RequestTiming | None:
+    return _current.get()
+
+
+@contextmanager
+def timed(phase: str):
+    """Добавляет длительность блока к фазе текущего запроса, если он есть."""
+    timing = _current.get()
+    if timing is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing.add(phase, time.perf_counter() - started)
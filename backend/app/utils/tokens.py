@@ -0,0 +1,23 @@
+import math
+from functools import lru_cache
+
+# Служебные токены, которые провайдер добавляет к каждому сообщению (роль, разделители)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+@lru_cache(maxsize=4096)
+def estimate_tokens(text: str) -> int:
+    """Грубая локальная оценка числа токенов без обращения к токенизатору.
+
+    Латиница в BPE-токенизаторах занимает около 4 символов на токен,
+    кириллица и прочий не-ASCII текст — около 2, поэтому считаем их раздельно.
+    Оценка намеренно немного завышена: бюджет не должен переполняться.
+    """
+    if not text:
+        return 0
+    ascii_chars = sum(1 for char in text if char.isascii())
+    return math.ceil(ascii_chars / 4 + (len(text) - ascii_chars) / 2)
+
+
+def estimate_message_tokens(content: str) -> int:
+    return estimate_tokens(content) + MESSAGE_OVERHEAD_TOKENS
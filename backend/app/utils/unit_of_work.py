@@ -1,5 +1,6 @@
 from abc import ABC, abstractmethod
 
+from app.core.security.principal_cache import invalidate_changed_principals
 from app.database import async_session_maker
 from app.repositories.chat_repository import ChatRepository
 from app.repositories.message_repository import MessageRepository
@@ -49,6 +50,7 @@ class UnitOfWork(IUnitOfWork):
 
     async def commit(self):
         await self.session.commit()
+        await invalidate_changed_principals(self.session)
 
     async def rollback(self):
         await self.session.rollback()
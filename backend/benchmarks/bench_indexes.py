@@ -0,0 +1,145 @@
+"""Планы и задержки горячих запросов чатов/сообщений без составных индексов и с ними.
+
+Засевает локальную базу (по умолчанию SQLite, либо BENCH_DATABASE_URL),
+перехватывает SQL, который выполняют методы репозиториев, и для каждого
+запроса печатает EXPLAIN и задержки до и после создания индексов
+ix_chats_owner_id_id и ix_messages_chat_id_id.
+
+    python -m benchmarks.bench_indexes --users 200 --chats 20 --messages 40
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks import common
+
+
+async def seed(users: int, chats_per_user: int, messages_per_chat: int) -> None:
+    from app.database import engine
+    from app.models import Chat, Message, User
+    from app.models.base import Base
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(User.__table__.insert(), [
+            {"id": u, "email": f"user{u}@example.com", "hashed_password": "-"}
+            for u in range(1, users + 1)
+        ])
+        # Чаты и сообщения пользователей перемешаны, как в живой базе
+        chats = [
+            {"title": f"chat {u}-{c}", "owner_id": u}
+            for c in range(chats_per_user) for u in range(1, users + 1)
+        ]
+        await conn.execute(Chat.__table__.insert(), chats)
+        total_chats = len(chats)
+        batch = []
+        for m in range(messages_per_chat):
+            for chat_id in range(1, total_chats + 1):
+                batch.append({"chat_id": chat_id, "sender_id": 1,
+                              "content": f"message {m}", "role": "user"})
+                if len(batch) >= 10000:
+                    await conn.execute(Message.__table__.insert(), batch)
+                    batch = []
+        if batch:
+            await conn.execute(Message.__table__.insert(), batch)
+
+
+def hot_queries(users: int, chats_per_user: int) -> dict:
+    """Имя запроса -> корутина, вызывающая метод репозитория."""
+    chat_id = users * chats_per_user // 2
+    owner_id = users // 2
+    return {
+        "MessageRepository.get_by_chat": lambda uow: uow.message.get_by_chat(chat_id, limit=50),
+        "MessageRepository.get_recent": lambda uow: uow.message.get_recent(chat_id, 100),
+        "MessageRepository.count_after": lambda uow: uow.message.count_after(chat_id, 0),
+        "ChatRepository.get_page(owner_id)": lambda uow: uow.chat.get_page(100, owner_id=owner_id),
+        "UserRepository.get_by_email": lambda uow: uow.user.get_by_email(
+            f"user{owner_id}@example.com"),
+    }
+
+
+async def measure(queries: dict, repeats: int) -> dict:
+    from sqlalchemy import event
+
+    from app.database import engine
+    from app.utils.unit_of_work import UnitOfWork
+
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        captured.append((statement, parameters))
+
+    explain = "EXPLAIN QUERY PLAN " if engine.dialect.name == "sqlite" else "EXPLAIN "
+    results = {}
+    uow = UnitOfWork()
+    for name, query in queries.items():
+        captured.clear()
+        event.listen(engine.sync_engine, "before_cursor_execute", capture)
+        async with uow:
+            await query(uow)
+        event.remove(engine.sync_engine, "before_cursor_execute", capture)
+        statement, parameters = captured[0]
+
+        async with engine.connect() as conn:
+            plan = await conn.exec_driver_sql(explain + statement, parameters)
+            plan_rows = [" | ".join(str(col) for col in row) for row in plan.all()]
+
+        latencies = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            async with uow:
+                await query(uow)
+            latencies.append(time.perf_counter() - started)
+        results[name] = {
+            "plan": plan_rows,
+            "p50_ms": round(common.percentile(latencies, 50) * 1000, 3),
+            "p95_ms": round(common.percentile(latencies, 95) * 1000, 3),
+        }
+    return results
+
+
+async def run(args) -> dict:
+    from app.database import engine
+    from app.models import Chat, Message
+
+    common.quiet_logs()
+    await seed(args.users, args.chats, args.messages)
+    indexes = list(Chat.__table__.indexes) + list(Message.__table__.indexes)
+    queries = hot_queries(args.users, args.chats)
+
+    async with engine.begin() as conn:
+        for index in indexes:
+            await conn.run_sync(index.drop)
+    before = await measure(queries, args.repeats)
+
+    async with engine.begin() as conn:
+        for index in indexes:
+            await conn.run_sync(index.create)
+    after = await measure(queries, args.repeats)
+
+    await engine.dispose()
+    return {
+        "rows": {
+            "chats": args.users * args.chats,
+            "messages": args.users * args.chats * args.messages,
+        },
+        "before": before,
+        "after": after,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--chats", type=int, default=20, help="чатов на пользователя")
+    parser.add_argument("--messages", type=int, default=40, help="сообщений на чат")
+    parser.add_argument("--repeats", type=int, default=200)
+    args = parser.parse_args()
+    common.configure_env(llm_port=common.free_port())
+    print(json.dumps(asyncio.run(run(args)), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
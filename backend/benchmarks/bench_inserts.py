@@ -0,0 +1,93 @@
+"""Сколько запросов и времени уходит на запись одного хода чата (2 сообщения).
+
+Сравнивает прежнюю вставку (INSERT + SELECT последнего id + SELECT строки),
+новый add_one и add_many. Запросы считаются по событию before_cursor_execute.
+
+    python -m benchmarks.bench_inserts --turns 500
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks import common
+
+
+async def legacy_add_one(repository, data: dict):
+    from sqlalchemy import insert, select
+
+    model = repository.model
+    await repository.session.execute(insert(model).values(**data))
+    result = await repository.session.execute(
+        select(model.id).order_by(model.id.desc()).limit(1))
+    last_id = result.scalar_one()
+    result = await repository.session.execute(
+        select(model).where(model.id == last_id))
+    return result.scalar_one()
+
+
+async def run(turns: int) -> dict:
+    from sqlalchemy import event
+
+    from app.database import engine
+    from app.utils.unit_of_work import UnitOfWork
+
+    common.quiet_logs()
+    await common.prepare_database()
+    statements = 0
+
+    def count(*args):
+        nonlocal statements
+        statements += 1
+
+    event.listen(engine.sync_engine, "before_cursor_execute", count)
+
+    def turn_data(i: int) -> list[dict]:
+        return [
+            {"chat_id": 1, "sender_id": 1, "content": f"вопрос {i}", "role": "user"},
+            {"chat_id": 1, "sender_id": 1, "content": f"ответ {i}", "role": "assistant"},
+        ]
+
+    async def legacy(uow, data):
+        for item in data:
+            await legacy_add_one(uow.message, item)
+
+    async def add_one(uow, data):
+        for item in data:
+            await uow.message.add_one(item)
+
+    async def add_many(uow, data):
+        await uow.message.add_many(data)
+
+    results = {}
+    for name, write in (("legacy", legacy), ("add_one", add_one), ("add_many", add_many)):
+        uow = UnitOfWork()
+        latencies = []
+        statements = 0
+        for i in range(turns):
+            started = time.perf_counter()
+            async with uow:
+                await write(uow, turn_data(i))
+                await uow.commit()
+            latencies.append(time.perf_counter() - started)
+        results[name] = {
+            "statements_per_turn": round(statements / turns, 2),
+            "p50_ms": round(common.percentile(latencies, 50) * 1000, 3),
+            "p95_ms": round(common.percentile(latencies, 95) * 1000, 3),
+        }
+
+    await engine.dispose()
+    results["dialect"] = engine.dialect.name
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=500)
+    args = parser.parse_args()
+    common.configure_env(llm_port=common.free_port())
+    print(json.dumps(asyncio.run(run(args.turns)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
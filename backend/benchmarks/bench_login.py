@@ -0,0 +1,119 @@
+"""Пропускная способность и хвостовые задержки входа под нагрузкой.
+
+Шлет concurrency одновременных POST /api/auth/login и параллельно меряет
+задержку event loop (насколько запаздывает sleep(10 мс)) — столько же ждал бы
+любой запрос чата. Режим inline считает bcrypt прямо в event loop, как раньше,
+режим executor — в пуле потоков из pwdcrypt.
+
+    python -m benchmarks.bench_login --requests 200 --concurrency 20 --rounds 10
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks import common
+
+PASSWORD = "bench-password"
+
+
+async def seed(users: int, hashed_password: str) -> None:
+    from app.database import engine
+    from app.models import User
+    from app.models.base import Base
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(User.__table__.insert(), [
+            {"email": f"user{i}@example.com", "hashed_password": hashed_password}
+            for i in range(users)
+        ])
+
+
+async def loop_lag(stop: asyncio.Event, lags: list[float]) -> None:
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(0.01)
+        lags.append(time.perf_counter() - started - 0.01)
+
+
+async def login_storm(requests: int, concurrency: int, users: int) -> dict:
+    from httpx import ASGITransport, AsyncClient
+
+    from app.main import app
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors, lags = [], 0, []
+
+    async with AsyncClient(transport=ASGITransport(app=app),
+                           base_url="http://bench") as client:
+        async def one(i: int):
+            nonlocal errors
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post("/api/auth/login", data={
+                    "username": f"user{i % users}@example.com", "password": PASSWORD})
+                if response.status_code == 200:
+                    latencies.append(time.perf_counter() - started)
+                else:
+                    errors += 1
+
+        stop = asyncio.Event()
+        probe = asyncio.create_task(loop_lag(stop, lags))
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(requests)))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await probe
+
+    result = common.summarize(latencies, elapsed, errors)
+    result["loop_lag_p99_ms"] = round(common.percentile(lags, 99) * 1000, 2)
+    result["loop_lag_max_ms"] = round(max(lags, default=0) * 1000, 2)
+    return result
+
+
+async def run(args) -> dict:
+    from app.core.security import pwdcrypt
+    from app.database import engine
+
+    common.quiet_logs()
+    await seed(args.users, pwdcrypt.pwd_context.hash(PASSWORD))
+
+    async def inline(fn, *fn_args):
+        return fn(*fn_args)
+
+    results = {}
+    run_in_executor = pwdcrypt._run
+    for mode in ("inline", "executor"):
+        pwdcrypt._run = inline if mode == "inline" else run_in_executor
+        results[mode] = await login_storm(args.requests, args.concurrency, args.users)
+    pwdcrypt._run = run_in_executor
+
+    pwdcrypt.shutdown_executor()
+    await engine.dispose()
+    results["settings"] = {
+        "bcrypt_rounds": pwdcrypt.settings.BCRYPT_ROUNDS,
+        "workers": pwdcrypt.settings.PASSWORD_HASH_WORKERS,
+        "max_pending": pwdcrypt.settings.PASSWORD_HASH_MAX_PENDING,
+    }
+    return results
+
+
+def main() -> None:
+    import os
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--rounds", type=int, help="BCRYPT_ROUNDS для прогона")
+    args = parser.parse_args()
+    common.configure_env(llm_port=common.free_port())
+    if args.rounds:
+        os.environ["BCRYPT_ROUNDS"] = str(args.rounds)
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Пропускная способность POST /api/chats/{chat_id}/messages при конкурентной нагрузке.
+
+Поднимает фейковый провайдер с фиксированной задержкой и гоняет запросы через
+приложение in-process. Пока вызов LLM блокировал event loop, RPS не превышал
+1 / latency при любой конкурентности; с асинхронным клиентом он растет
+примерно как concurrency / latency (до ограничений пула БД).
+
+    python -m benchmarks.bench_send_message --requests 200 --concurrency 20
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks import common
+
+
+async def run(args) -> dict:
+    import httpx
+    from app.database import engine
+    from app.main import app
+
+    common.quiet_logs()
+    common.override_current_user(app)
+    await common.prepare_database(chats=args.concurrency)
+
+    latencies: list[float] = []
+    errors = 0
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+                transport=transport, base_url="http://bench", timeout=None) as client:
+
+            async def send(i: int) -> None:
+                nonlocal errors
+                chat_id = i % args.concurrency + 1
+                async with semaphore:
+                    started = time.perf_counter()
+                    response = await client.post(
+                        f"/api/chats/{chat_id}/messages",
+                        json={"content": f"Вопрос номер {i}"})
+                    if response.status_code == 200:
+                        latencies.append(time.perf_counter() - started)
+                    else:
+                        errors += 1
+
+            started = time.perf_counter()
+            await asyncio.gather(*(send(i) for i in range(args.requests)))
+            elapsed = time.perf_counter() - started
+    await engine.dispose()
+
+    result = common.summarize(latencies, elapsed, errors)
+    result.update(
+        concurrency=args.concurrency,
+        llm_latency_s=args.latency,
+        ideal_rps=round(args.concurrency / args.latency, 2),
+    )
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.2,
+                        help="задержка фейкового провайдера, секунды")
+    args = parser.parse_args()
+
+    llm_port = common.free_port()
+    common.configure_env(llm_port)
+    from benchmarks.fake_llm import create_app
+    server = common.serve_in_thread(create_app(latency=args.latency), llm_port)
+    try:
+        print(json.dumps(asyncio.run(run(args)), ensure_ascii=False, indent=2))
+    finally:
+        server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
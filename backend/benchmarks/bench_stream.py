@@ -0,0 +1,85 @@
+"""Время до первого байта: POST /{chat_id}/messages против /{chat_id}/messages/stream.
+
+Приложение поднимается настоящим uvicorn-сервером (ASGITransport буферизует
+тело ответа и не подходит для замера TTFB), провайдер — фейковый с
+задержкой до первого токена и заданной скоростью генерации.
+
+    python -m benchmarks.bench_stream --requests 20 --latency 0.3 --token-rate 50
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks import common
+
+
+async def prepare() -> None:
+    from app.database import engine
+
+    await common.prepare_database()
+    # Соединения aiosqlite привязаны к циклу, сервер поднимет свои
+    await engine.dispose()
+
+
+async def measure(base_url: str, path: str, requests: int) -> dict:
+    import httpx
+
+    ttfb: list[float] = []
+    total: list[float] = []
+    async with httpx.AsyncClient(base_url=base_url, timeout=None) as client:
+        for i in range(requests):
+            started = time.perf_counter()
+            first_byte = None
+            async with client.stream(
+                    "POST", path, json={"content": f"Вопрос {i}"}) as response:
+                async for line in response.aiter_lines():
+                    if first_byte is None and line:
+                        first_byte = time.perf_counter() - started
+            ttfb.append(first_byte)
+            total.append(time.perf_counter() - started)
+    return {
+        "ttfb_p50_ms": round(common.percentile(ttfb, 50) * 1000, 2),
+        "ttfb_p95_ms": round(common.percentile(ttfb, 95) * 1000, 2),
+        "total_p50_ms": round(common.percentile(total, 50) * 1000, 2),
+        "total_p95_ms": round(common.percentile(total, 95) * 1000, 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.3,
+                        help="задержка до первого токена, секунды")
+    parser.add_argument("--tokens", type=int, default=100)
+    parser.add_argument("--token-rate", type=float, default=50.0)
+    args = parser.parse_args()
+
+    llm_port, app_port = common.free_port(), common.free_port()
+    common.configure_env(llm_port)
+    from benchmarks.fake_llm import create_app
+    llm_server = common.serve_in_thread(
+        create_app(args.latency, args.tokens, args.token_rate), llm_port)
+
+    from app.main import app
+    common.quiet_logs()
+    common.override_current_user(app)
+    asyncio.run(prepare())
+    app_server = common.serve_in_thread(app, app_port)
+
+    base_url = f"http://127.0.0.1:{app_port}"
+    try:
+        result = {
+            "blocking": asyncio.run(
+                measure(base_url, "/api/chats/1/messages", args.requests)),
+            "stream": asyncio.run(
+                measure(base_url, "/api/chats/1/messages/stream", args.requests)),
+        }
+        print(json.dumps(result, indent=2))
+    finally:
+        app_server.should_exit = True
+        llm_server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Общие помощники бенчмарков: окружение, локальная БД, фоновые серверы, статистика.
+
+Бенчмарки запускаются из каталога backend (python -m benchmarks.<имя>) и по
+умолчанию используют локальную SQLite-базу (aiosqlite из requirements-dev.txt).
+Модули приложения импортируются только после configure_env().
+"""
+import logging
+import os
+import socket
+import threading
+import time
+
+import uvicorn
+
+BENCH_DATABASE_URL = "sqlite+aiosqlite:///./bench.db"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def configure_env(llm_port: int, database_url: str | None = None) -> None:
+    os.environ["DATABASE_URL"] = (
+        database_url or os.getenv("BENCH_DATABASE_URL", BENCH_DATABASE_URL))
+    os.environ["GPT_URL"] = f"http://127.0.0.1:{llm_port}/v1"
+    os.environ.setdefault("GPT_API_KEY", "bench")
+    # Лимиты на пользователя рассчитаны на людей, а не на генератор нагрузки
+    os.environ.setdefault("LLM_RATE_LIMIT_ENABLED", "false")
+
+
+def quiet_logs() -> None:
+    from app.core.my_logging import logger
+    from app.database import engine
+
+    engine.echo = False
+    logger.setLevel(logging.WARNING)
+
+
+def serve_in_thread(app, port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(
+        app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server
+
+
+async def prepare_database(chats: int = 1) -> None:
+    """Пересоздает схему и заводит пользователя с id=1 и его чаты."""
+    from app.database import engine
+    from app.models import Chat, User
+    from app.models.base import Base
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    async with engine.begin() as conn:
+        await conn.execute(User.__table__.insert().values(
+            id=1, email="bench@example.com", hashed_password="-"))
+        await conn.execute(Chat.__table__.insert(), [
+            {"id": i, "title": f"Bench chat {i}", "owner_id": 1}
+            for i in range(1, chats + 1)
+        ])
+
+
+def override_current_user(app) -> None:
+    from app.core.security.auth import get_current_user
+    from app.schemas.user import UserOut
+
+    async def bench_user():
+        return UserOut(id=1, email="bench@example.com")
+
+    app.dependency_overrides[get_current_user] = bench_user
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(latencies: list[float], elapsed: float, errors: int = 0) -> dict:
+    total = len(latencies) + errors
+    return {
+        "requests": total,
+        "errors": errors,
+        "error_rate": round(errors / total, 4) if total else 0.0,
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
@@ -0,0 +1,108 @@
+"""Фейковый OpenAI-совместимый провайдер для бенчмарков.
+
+Поддерживает обычные и потоковые (stream=true) ответы и случайные ошибки
+провайдера (доля error_rate отвечает 500).
+
+Отдельный запуск:
+    python -m benchmarks.fake_llm --port 9100 --latency 0.5 --token-rate 50
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+def _make_reply(messages: list[dict], tokens: int) -> list[str]:
+    prompt = messages[-1]["content"] if messages else ""
+    words = [f"Ответ на: {prompt[:40]}."]
+    words.extend(f"слово{i}" for i in range(tokens - 1))
+    return words
+
+
+def _chunk(model: str, delta: dict, finish_reason: str | None = None) -> str:
+    payload = {
+        "id": "chatcmpl-bench",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+    return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+def create_app(
+        latency: float = 0.5,
+        tokens: int = 50,
+        token_rate: float = 0.0,
+        error_rate: float = 0.0
+) -> FastAPI:
+    """latency — задержка до первого токена, token_rate — токенов в секунду
+    (0 — весь ответ сразу), error_rate — доля запросов, завершаемых 500."""
+    app = FastAPI()
+    token_delay = 1 / token_rate if token_rate else 0.0
+
+    async def stream_reply(model: str, words: list[str]):
+        await asyncio.sleep(latency)
+        yield _chunk(model, {"role": "assistant", "content": ""})
+        for i, word in enumerate(words):
+            if i and token_delay:
+                await asyncio.sleep(token_delay)
+            yield _chunk(model, {"content": word if i == 0 else " " + word})
+        yield _chunk(model, {}, finish_reason="stop")
+        yield "data: [DONE]\n\n"
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        if error_rate and random.random() < error_rate:
+            await asyncio.sleep(latency)
+            return JSONResponse(status_code=500, content={"error": {
+                "message": "fake upstream failure", "type": "server_error"}})
+        model = body.get("model", "fake")
+        words = _make_reply(body.get("messages", []), tokens)
+        if body.get("stream"):
+            return StreamingResponse(
+                stream_reply(model, words), media_type="text/event-stream")
+
+        await asyncio.sleep(latency + token_delay * (len(words) - 1))
+        return {
+            "id": "chatcmpl-bench",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": " ".join(words)},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": sum(
+                    len(m["content"].split()) for m in body.get("messages", [])),
+                "completion_tokens": len(words),
+                "total_tokens": len(words),
+            },
+        }
+
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", type=float, default=0.5,
+                        help="задержка ответа, секунды")
+    parser.add_argument("--tokens", type=int, default=50,
+                        help="длина ответа в токенах")
+    parser.add_argument("--token-rate", type=float, default=0.0,
+                        help="скорость генерации, токенов в секунду")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="доля ответов с ошибкой 500")
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.latency, args.tokens, args.token_rate, args.error_rate),
+                host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,234 @@
+"""Нагрузочный прогон одного инстанса бэкенда от входа до ответа LLM.
+
+Поднимает фейковый OpenAI-совместимый провайдер (задержка, скорость токенов,
+доля ошибок), заполняет локальную БД пользователями и чатами, запускает
+приложение настоящим uvicorn-сервером и на каждом уровне конкурентности
+гоняет сценарии:
+
+    login          POST /api/auth/login
+    list_chats     GET  /api/chats/
+    create_chat    POST /api/chats/messages
+    send_message   POST /api/chats/{chat_id}/messages
+
+Результат — JSON (RPS, p50/p95/p99, доля ошибок и коды ответов по каждому
+сценарию и уровню) в stdout или в --output, чтобы сравнивать ветки:
+
+    python -m benchmarks.load_test --concurrency 1,10,50 --duration 10 \\
+        --llm-latency 0.5 --llm-error-rate 0.01 --output before.json
+
+С --base-url нагрузка идет на уже запущенный сервер (например, uvicorn с
+несколькими воркерами); он должен смотреть в ту же БД (DATABASE_URL).
+Клиент и сервер в одном процессе делят GIL, поэтому абсолютные цифры
+занижены — для сравнения веток это одинаково для обеих сторон.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import time
+from collections import Counter
+
+from benchmarks import common
+
+PASSWORD = "load-test-password"
+SCENARIOS = ("login", "list_chats", "create_chat", "send_message")
+
+
+async def prepare(users: int, chats_per_user: int) -> None:
+    from app.core.security.pwdcrypt import pwd_context
+    from app.database import engine
+    from app.models import Chat, User
+    from app.models.base import Base
+
+    hashed_password = pwd_context.hash(PASSWORD)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(User.__table__.insert(), [
+            {"id": u, "email": f"load{u}@example.com", "hashed_password": hashed_password}
+            for u in range(1, users + 1)
+        ])
+        await conn.execute(Chat.__table__.insert(), [
+            {"title": f"Load chat {u}-{c}", "owner_id": u}
+            for u in range(1, users + 1) for c in range(chats_per_user)
+        ])
+    # Соединения aiosqlite привязаны к циклу, сервер откроет свои
+    await engine.dispose()
+
+
+class Session:
+    """Токен и чаты одного пользователя нагрузки."""
+
+    def __init__(self, user: int, token: str, chat_ids: list[int]):
+        self.user = user
+        self.headers = {"Authorization": f"Bearer {token}"}
+        self.chat_ids = chat_ids
+
+
+async def login(client, user: int):
+    return await client.post("/api/auth/login", data={
+        "username": f"load{user}@example.com", "password": PASSWORD})
+
+
+async def open_sessions(client, users: int) -> list[Session]:
+    sessions = []
+    for user in range(1, users + 1):
+        response = await login(client, user)
+        response.raise_for_status()
+        token = response.json()["access_token"]
+        chats = await client.get(
+            "/api/chats/", headers={"Authorization": f"Bearer {token}"})
+        chats.raise_for_status()
+        sessions.append(Session(user, token, [chat["id"] for chat in chats.json()]))
+    return sessions
+
+
+def scenario(name: str, client, sessions: list[Session], use_cache: bool):
+    params = {"use_cache": str(use_cache).lower()}
+
+    async def call(worker: int, i: int):
+        session = sessions[(worker + i) % len(sessions)]
+        content = {"content": f"Вопрос {worker}-{i}"}
+        if name == "login":
+            return await login(client, session.user)
+        if name == "list_chats":
+            return await client.get("/api/chats/", headers=session.headers)
+        if name == "create_chat":
+            return await client.post(
+                "/api/chats/messages", json=content,
+                params=params, headers=session.headers)
+        chat_id = session.chat_ids[i % len(session.chat_ids)]
+        return await client.post(
+            f"/api/chats/{chat_id}/messages", json=content,
+            params=params, headers=session.headers)
+
+    return call
+
+
+async def drive(call, concurrency: int, duration: float) -> dict:
+    """Замкнутая нагрузка: concurrency воркеров шлют запросы друг за другом."""
+    import httpx
+
+    latencies: list[float] = []
+    statuses: Counter = Counter()
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker(w: int) -> None:
+        nonlocal errors
+        i = 0
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                response = await call(w, i)
+                status = response.status_code
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            statuses[str(status)] += 1
+            if isinstance(status, int) and status < 400:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors += 1
+            i += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(w) for w in range(concurrency)))
+    result = common.summarize(latencies, time.perf_counter() - started, errors)
+    result["statuses"] = dict(statuses)
+    return result
+
+
+async def load(args, base_url: str) -> dict:
+    import httpx
+
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(
+            base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        sessions = await open_sessions(client, args.users)
+        results = {}
+        for name in args.scenarios:
+            call = scenario(name, client, sessions, args.use_cache)
+            results[name] = {}
+            for concurrency in args.concurrency:
+                results[name][str(concurrency)] = await drive(
+                    call, concurrency, args.duration)
+        return results
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], text=True,
+            stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", default="1,10,50",
+                        help="уровни конкурентности через запятую")
+    parser.add_argument("--duration", type=float, default=10.0,
+                        help="секунд на каждый сценарий и уровень")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--chats", type=int, default=5, help="чатов на пользователя")
+    parser.add_argument("--use-cache", action="store_true",
+                        help="разрешить кеш ответов LLM (по умолчанию выключен)")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--bcrypt-rounds", type=int, default=10)
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--llm-tokens", type=int, default=50)
+    parser.add_argument("--llm-token-rate", type=float, default=0.0)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--base-url", help="нагружать уже запущенный сервер")
+    parser.add_argument("--output", help="куда записать JSON с результатами")
+    args = parser.parse_args()
+    args.concurrency = [int(c) for c in args.concurrency.split(",")]
+    args.scenarios = [s for s in args.scenarios.split(",") if s]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    llm_port = common.free_port()
+    common.configure_env(llm_port)
+    os.environ["BCRYPT_ROUNDS"] = str(args.bcrypt_rounds)
+
+    from benchmarks.fake_llm import create_app
+
+    servers = [common.serve_in_thread(create_app(
+        latency=args.llm_latency, tokens=args.llm_tokens,
+        token_rate=args.llm_token_rate, error_rate=args.llm_error_rate), llm_port)]
+    try:
+        asyncio.run(prepare(args.users, args.chats))
+        base_url = args.base_url
+        if base_url is None:
+            from app.main import app
+
+            common.quiet_logs()
+            app_port = common.free_port()
+            servers.append(common.serve_in_thread(app, app_port))
+            base_url = f"http://127.0.0.1:{app_port}"
+
+        report = {
+            "revision": git_revision(),
+            "config": {
+                key: value for key, value in vars(args).items() if key != "output"
+            },
+            "results": asyncio.run(load(args, base_url)),
+        }
+    finally:
+        for server in servers:
+            server.should_exit = True
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()